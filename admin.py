@@ -1,13 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, flash, send_file
-from flask_login import login_user, logout_user, login_required
-from werkzeug.security import check_password_hash
-from models import Admin, User, db, Quiz, Question, QuestionTranslation, Option, OptionTranslation, Attempt, Answer  # Import db from models
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Use a non-interactive backend
-import matplotlib.pyplot as plt
-import io
-import base64
+from flask import Blueprint, render_template, redirect, url_for, request, flash, flash, send_file, Response, stream_with_context, make_response, jsonify, abort, current_app
+from flask_login import login_user, logout_user, login_required, current_user
+from models import Admin, User, db, Quiz, Question, QuestionTranslation, Option, OptionTranslation, Attempt, Answer, UserStats  # Import db from models
+from functools import partial
+import quiz_cache
+import exports
+import stats
+import charts
+import pagination
+import identity_cache
+import hashing
+import user_import
+import quiz_io
+import profiler
+import answer_store
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -18,44 +23,56 @@ def admin_login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        client = (request.remote_addr, username)
+        if hashing.throttle.is_blocked(client):
+            flash('Too many failed login attempts. Please wait a few minutes and try again.')
+            return render_template('admin/admin_login.html')
+
         admin = Admin.query.filter_by(username=username).first()
-        if admin and check_password_hash(admin.password, password):
+        try:
+            valid = admin is not None and hashing.service.check(admin.password, password)
+        except hashing.HashingBusy:
+            flash('The server is busy, please try again in a moment.')
+            return render_template('admin/admin_login.html')
+
+        if valid:
+            hashing.throttle.reset(client)
+            hashing.rehash_if_needed(admin, password)
             login_user(admin)  # Using Flask-Login's login_user function
             return redirect(url_for('admin.dashboard'))
+        hashing.throttle.record_failure(client)
         flash('Invalid username or password')
     return render_template('admin/admin_login.html')
 
 @admin_bp.route('/logout')
 @login_required
 def admin_logout():
+    identity_cache.cache.invalidate(current_user.get_id())
     logout_user()
     return redirect(url_for('admin.admin_login'))
 
 @admin_bp.route('/export')
 @login_required
 def export():
-    attempts = Attempt.query.all()
-    data = [{
-        
-        "Nom": attempt.user.last_name,
-        "Prénom": attempt.user.first_name,
-        "CIN": attempt.user.cin,
-        "Service": attempt.user.service,
-        "Site": attempt.user.site,
-        "Formation": attempt.quiz.title,
-        "Points": attempt.score,
-        "Resultat": attempt.status,
-        "Date": attempt.time
-    } for attempt in attempts]
-    
-    df = pd.DataFrame(data)
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Evalution Formation')
-    writer.close()
-    output.seek(0)
-    
-    return send_file(output, as_attachment=True, download_name='evaluation.xlsx')
+    # Optional filters: quiz_id, site, service, date_from, date_to (YYYY-MM-DD)
+    try:
+        filters = exports.parse_filters(request.args)
+    except ValueError as e:
+        return str(e), 400
+
+    export_format = request.args.get('format', 'xlsx')
+    if export_format == 'csv':
+        return Response(stream_with_context(exports.iter_csv(filters)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=evaluation.csv'})
+    if export_format == 'csv.gz':
+        return Response(stream_with_context(exports.iter_csv(filters, compress=True)), mimetype='application/gzip',
+                        headers={'Content-Disposition': 'attachment; filename=evaluation.csv.gz'})
+    if export_format != 'xlsx':
+        return "Unknown export format, expected xlsx, csv or csv.gz", 400
+
+    output = exports.write_xlsx(filters)
+    return send_file(output, as_attachment=True, download_name='evaluation.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
 @admin_bp.route('/create_quiz', methods=['GET'])
 @login_required
@@ -65,90 +82,18 @@ def create_quiz():
 @admin_bp.route('/submit_quiz', methods=['POST'])
 @login_required
 def submit_quiz():
-    data = request.form
-    title = data.get('title')
-    language = data.get('language')
-    
-    # Debug statements for quiz title and language
-    print(f"Quiz Title: {title}, Language: {language}")
-    
-    # Create new Quiz
-    quiz = Quiz(title=title, language=language, is_active=True)  #CHANGE THIS
-    db.session.add(quiz)
-    db.session.commit()  # Commit to get the quiz ID
-    
-    # Debug statement for quiz ID
-    print(f"Created Quiz with ID: {quiz.id}")
-
-    questions = [key for key in data if key.startswith('questions')]
-    print(f"Form Keys: {questions}")
+    quiz = quiz_io.from_form(request.form)
+    print(f"Quiz Title: {quiz['title']}, Language: {quiz['language']}, Questions: {len(quiz['questions'])}")
 
-    question_indices = sorted(set(int(key.split('[')[1].split(']')[0]) for key in questions if 'title' in key))
-    print(f"Question Indices: {question_indices}")
+    # The form is checked client side too, but never trust it
+    errors = quiz_io.validate(quiz)
+    if errors:
+        return render_template('admin/create_quiz.html', errors=errors), 400
 
-    for q_idx in question_indices:
-        question_title = data.get(f'questions[{q_idx}][title]')
-        
-        # Debug statement for question title
-        print(f"Question {q_idx + 1} Title: {question_title}")
-        
-        # Create new Question
-        question_entry = Question(title=question_title, quiz_id=quiz.id)
-        db.session.add(question_entry)
-        db.session.commit()  # Commit to get the question ID
-
-        # Debug statement for question ID
-        print(f"Created Question with ID: {question_entry.id}")
-
-        # Handle question translations
-        for lang in ['fr', 'ar']:
-            translation_title = data.get(f'translations[{q_idx}][{lang}]')
-            print(f"Question {q_idx + 1} Translation [{lang}]: {translation_title}")
-
-            translation_entry = QuestionTranslation(
-                question_id=question_entry.id,
-                language=lang,
-                title=translation_title
-            )
-            db.session.add(translation_entry)
-
-        option_keys = [key for key in data if key.startswith(f'questions[{q_idx}][options]')]
-        option_indices = sorted(set(int(key.split('[')[3].split(']')[0]) for key in option_keys if 'text' in key))
-        print(f"Option Indices for Question {q_idx + 1}: {option_indices}")
-
-        for o_idx in option_indices:
-            option_text = data.get(f'questions[{q_idx}][options][{o_idx}][text]')
-            is_correct = data.get(f'questions[{q_idx}][options][{o_idx}][is_correct]') == 'true'
-            
-            # Debug statement for option text and is_correct flag
-            print(f"Option {o_idx + 1} Text: {option_text}, Is Correct: {is_correct}")
-            
-            # Create new Option
-            option_entry = Option(
-                question_id=question_entry.id,
-                text=option_text,
-                is_correct=is_correct
-            )
-            db.session.add(option_entry)
-            db.session.commit()  # Commit to get the option ID
-
-            # Debug statement for option ID
-            print(f"Created Option with ID: {option_entry.id}")
-
-            # Handle option translations
-            for lang in ['fr', 'ar']:
-                option_translation_text = data.get(f'translations[{q_idx}][options][{o_idx}][{lang}]')
-                print(f"Option {o_idx + 1} Translation [{lang}]: {option_translation_text}")
-
-                option_translation_entry = OptionTranslation(
-                    option_id=option_entry.id,
-                    language=lang,
-                    text=option_translation_text
-                )
-                db.session.add(option_translation_entry)
-
-    db.session.commit()
-    return redirect(url_for('admin.view_quiz', quiz_id=quiz.id))
+    # Quiz, questions, options and translations in one transaction
+    quiz_id = quiz_io.create_quiz(quiz, is_active=True)
+    print(f"Created Quiz with ID: {quiz_id}")
+    return redirect(url_for('admin.view_quiz', quiz_id=quiz_id))
 
 @admin_bp.route('/view_quiz/<int:quiz_id>')
 @login_required
@@ -173,6 +118,7 @@ def set_active_quiz(quiz_id):
         quiz = Quiz.query.get_or_404(quiz_id)
         quiz.is_active = True
         db.session.commit()
+        quiz_cache.invalidate()
 
         return redirect(url_for('admin.view_all_quizzes'))
     except Exception as e:
@@ -186,110 +132,179 @@ def deactivate_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
     quiz.is_active = False
     db.session.commit()
+    quiz_cache.invalidate()
     
     return redirect(url_for('admin.quizzes'))
 
+# Columns the list pages can be sorted by; rows are paginated by (column, id)
+USER_SORTS = {'id': User.id, 'emp_id': User.emp_id, 'last_name': User.last_name, 'site': User.site, 'service': User.service}
+ATTEMPT_SORTS = {'time': Attempt.time, 'score': Attempt.score, 'id': Attempt.id}
+
+def _sites_and_services():
+    # Small rollup table, cheaper than SELECT DISTINCT over Users
+    rows = db.session.query(UserStats.site, UserStats.service).all()
+    return sorted({site for site, _ in rows}), sorted({service for _, service in rows})
+
 @admin_bp.route('/users')
 def view_users():
-    # Fetch all users
-    users = User.query.all()
-    return render_template('admin/view_users.html', users=users)
+    sort = request.args.get('sort') if request.args.get('sort') in USER_SORTS else 'id'
+    descending = request.args.get('order') == 'desc'
+
+    query = User.query
+    for name in ('site', 'service', 'emp_id'):
+        if request.args.get(name):
+            query = query.filter(getattr(User, name) == request.args[name])
+
+    try:
+        page = pagination.keyset_page(
+            query, USER_SORTS[sort], User.id, descending,
+            after=request.args.get('after'), before=request.args.get('before'),
+            size=pagination.page_size(request.args),
+            row_key=lambda user: (getattr(user, sort), user.id)
+        )
+    except ValueError as e:
+        return str(e), 400
+
+    sites, services = _sites_and_services()
+    return render_template('admin/view_users.html', page=page, sort=sort, descending=descending,
+                           sites=sites, services=services,
+                           page_url=partial(pagination.page_url, 'admin.view_users', request.args))
+
+@admin_bp.route('/users/import', methods=['GET', 'POST'])
+@login_required
+def import_users():
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Choose a CSV or XLSX file to import.', 'danger')
+            return redirect(url_for('admin.import_users'))
+        try:
+            report = user_import.import_users(upload.stream, upload.filename,
+                                              current_app.config.get('BULK_IMPORT_HASH_METHOD'))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.import_users'))
+    return render_template('admin/import_users.html', report=report, columns=user_import.COLUMNS)
+
+@admin_bp.route('/users/<int:user_id>/details')
+@login_required
+def user_details(user_id):
+    # Loaded on demand into the user modal
+    user = User.query.get_or_404(user_id)
+    attempts = (
+        db.session.query(Attempt, Quiz.title)
+        .join(Quiz, Quiz.id == Attempt.quiz_id)
+        .filter(Attempt.user_id == user_id)
+        .order_by(Attempt.time.desc())
+        .all()
+    )
+    return render_template('admin/user_details.html', user=user, attempts=attempts)
 
 @admin_bp.route('/attempts')
 def view_attempts():
-    # Fetch all attempts and join with related quiz and user data
-    attempts = db.session.query(Attempt, User, Quiz).join(User).join(Quiz).all()
-    return render_template('admin/view_attempts.html', attempts=attempts)
+    sort = request.args.get('sort') if request.args.get('sort') in ATTEMPT_SORTS else 'time'
+    descending = request.args.get('order', 'desc') == 'desc'
 
-@admin_bp.route('/dashboard')
-def dashboard():
-    # Fetch data from the database
-    total_users = User.query.count()
-    total_quizzes = Quiz.query.count()
-    total_attempts = Attempt.query.count()
-
-    attempts_per_quiz = (
-        db.session.query(Quiz.title, db.func.count(Attempt.id).label('attempt_count'))
-        .outerjoin(Attempt, Quiz.id == Attempt.quiz_id)
-        .group_by(Quiz.id)
-        .all()
+    # Same filters as the export: quiz_id, site, service, status, date_from, date_to
+    try:
+        filters = exports.parse_filters(request.args)
+    except ValueError as e:
+        return str(e), 400
+
+    query = (
+        db.session.query(Attempt, User, Quiz)
+        .join(User, User.id == Attempt.user_id)
+        .join(Quiz, Quiz.id == Attempt.quiz_id)
     )
+    query = exports.apply_attempt_filters(query, filters)
 
-    score_distribution = (
-        db.session.query(
-            db.func.avg(Attempt.score).label('avg_score'),
-            db.func.min(Attempt.score).label('min_score'),
-            db.func.max(Attempt.score).label('max_score')
-        ).one()
+    try:
+        page = pagination.keyset_page(
+            query, ATTEMPT_SORTS[sort], Attempt.id, descending,
+            after=request.args.get('after'), before=request.args.get('before'),
+            size=pagination.page_size(request.args),
+            row_key=lambda row: (getattr(row[0], sort), row[0].id)
+        )
+    except ValueError as e:
+        return str(e), 400
+
+    sites, services = _sites_and_services()
+    return render_template('admin/view_attempts.html', page=page, sort=sort, descending=descending,
+                           quizzes=db.session.query(Quiz.id, Quiz.title).order_by(Quiz.id).all(),
+                           sites=sites, services=services,
+                           page_url=partial(pagination.page_url, 'admin.view_attempts', request.args))
+
+@admin_bp.route('/attempts/<int:attempt_id>/details')
+@login_required
+def attempt_details(attempt_id):
+    # Loaded on demand into the attempt modal instead of one modal per row
+    attempt, user, quiz = (
+        db.session.query(Attempt, User, Quiz)
+        .join(User, User.id == Attempt.user_id)
+        .join(Quiz, Quiz.id == Attempt.quiz_id)
+        .filter(Attempt.id == attempt_id)
+        .first_or_404()
     )
+    answers = answer_store.attempt_answers(attempt_id)  # Rows or packed, same per-option rows
+    return render_template('admin/attempt_details.html', attempt=attempt, user=user, quiz=quiz, answers=answers)
 
-    metrics_data = {
-        "total_users": total_users,
-        "total_quizzes": total_quizzes,
-        "total_attempts": total_attempts,
-        "attempts_per_quiz": [{'title': item[0], 'attempt_count': item[1]} for item in attempts_per_quiz],
-        "score_distribution": {
-            "avg_score": score_distribution.avg_score,
-            "min_score": score_distribution.min_score,
-            "max_score": score_distribution.max_score,
-        }
-    }
-
-    # Generate charts
-    attempts_per_quiz_img = generate_attempts_per_quiz_chart(metrics_data["attempts_per_quiz"])
-    score_distribution_img = generate_score_distribution_chart(metrics_data["score_distribution"])
+@admin_bp.route('/dashboard')
+def dashboard():
+    # Read the incrementally maintained rollups instead of scanning Attempts
+    metrics_data = stats.dashboard_metrics()
+
+    # Charts are served by admin.chart; the hash in the URL changes with the data
+    chart_versions = {name: charts.data_hash(charts.chart_data(name, metrics_data)) for name in charts.RENDERERS}
 
     return render_template('admin/metrics.html',
                            metrics=metrics_data,
-                           attempts_per_quiz_img=attempts_per_quiz_img,
-                           score_distribution_img=score_distribution_img)
+                           chart_versions=chart_versions)
 
-def generate_attempts_per_quiz_chart(attempts_per_quiz):
-    fig, ax = plt.subplots()
-    quizzes = [item["title"] for item in attempts_per_quiz]
-    attempts = [item["attempt_count"] for item in attempts_per_quiz]
-    
-    # Create the bar chart
-    ax.bar(quizzes, attempts, color='teal')
-    ax.set_xlabel('Quizzes')
-    ax.set_ylabel('Number of Attempts')
-    ax.set_title('Attempts per Quiz')
-    
-    # Rotate x-axis labels to vertical
-    ax.set_xticks(range(len(quizzes)))
-    ax.set_xticklabels(quizzes, rotation=90, ha='center')
-
-    # Improve layout
-    plt.tight_layout()
-
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    img_base64 = base64.b64encode(img.getvalue()).decode('utf8')
-    plt.close(fig)
-    return img_base64
-
-def generate_score_distribution_chart(score_distribution):
-    fig, ax = plt.subplots()
-    categories = ['Average Score', 'Minimum Score', 'Maximum Score']
-    
-    # Ensure all values are non-negative; replace negative values with zero
-    scores = [
-        max(score_distribution["avg_score"], 0),
-        max(score_distribution["min_score"], 0),
-        max(score_distribution["max_score"], 0)
-    ]
-    
-    # Check if all scores are zero, which would lead to an invalid pie chart
-    if all(score == 0 for score in scores):
-        scores = [1, 1, 1]  # Fallback values to ensure at least some data in the pie chart
-
-    ax.pie(scores, labels=categories, autopct='%1.1f%%', colors=['purple', 'orange', 'red'])
-    ax.set_title('Score Distribution')
-
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    img_base64 = base64.b64encode(img.getvalue()).decode('utf8')
-    plt.close(fig)
-    return img_base64
+@admin_bp.route('/charts/<name>.png')
+@login_required
+def chart(name):
+    if name not in charts.RENDERERS:
+        abort(404)
+    data = charts.chart_data(name, stats.dashboard_metrics())
+    if charts.data_hash(data) in request.if_none_match:
+        # The browser's copy is current, skip rendering altogether
+        response = make_response('', 304)
+        response.set_etag(charts.data_hash(data))
+        return response
+
+    etag, png = charts.get_chart(name, data)
+    response = make_response(png)
+    response.mimetype = 'image/png'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response.make_conditional(request)
+
+@admin_bp.route('/cache_stats.json')
+@login_required
+def cache_stats():
+    # Hit/miss counters of the in-process caches of this worker
+    return jsonify({'identity': identity_cache.cache.stats()})
+
+@admin_bp.route('/profiler')
+@login_required
+def profiler_page():
+    return render_template('admin/profiler.html', profile=profiler.profiler.summary())
+
+@admin_bp.route('/profiler.json')
+@login_required
+def profiler_json():
+    # Timings of this worker only; each process keeps its own buffers
+    return jsonify(profiler.profiler.summary())
+
+@admin_bp.route('/profiler/reset', methods=['POST'])
+@login_required
+def profiler_reset():
+    profiler.profiler.reset()
+    return redirect(url_for('admin.profiler_page'))
+
+@admin_bp.route('/metrics.json')
+@login_required
+def metrics_json():
+    # Raw dashboard data, for drawing the charts client-side
+    return jsonify(stats.dashboard_metrics())
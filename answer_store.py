@@ -0,0 +1,334 @@
+from collections import namedtuple
+from threading import Lock
+import hashlib
+import json
+import time
+
+import click
+from flask import current_app
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Attempt, Answer, QuizLayout, PackedAnswer
+import quiz_cache
+
+# Storage of the selected options of each attempt, in one of two formats:
+#
+#   rows    one Answers row per selected option (attempt, question, option,
+#           is_correct): ~15 rows and their index entries per attempt
+#   packed  one PackedAnswers row per attempt: for every question of the
+#           quiz layout, ceil(options / 8) bytes with bit i set when the
+#           i-th option (by id) was selected. is_correct is not stored, the
+#           layout knows which options are correct.
+#
+# ANSWER_STORAGE picks the format of new attempts. Reads go through
+# answer_rows(), which returns the same per-option rows for both, so an
+# existing database keeps working and 'flask pack-answers' can convert it
+# at any time.
+#
+# Packing saves space, not write time: benchmarks/answer_storage.py finds
+# the packed tables ~16x smaller, but save_attempt costs the same in both
+# formats (the transaction's commit dominates, not the row count).
+
+AnswerRow = namedtuple('AnswerRow', ['id', 'attempt_id', 'question_id', 'option_id', 'is_correct'])
+
+# questions: (question_id, option_ids, correct ids, offset) in layout order;
+# positions: question_id -> (offset, {option_id: bit}, correct ids)
+Layout = namedtuple('Layout', ['id', 'quiz_id', 'questions', 'positions', 'size'])
+
+# Attempts converted per transaction by pack-answers, and read per query by iter_answer_rows
+BATCH_SIZE = 500
+
+_lock = Lock()
+_layouts = {}  # layout id -> Layout; a layout never changes once committed
+_layout_ids = {}  # fingerprint -> layout id
+
+
+def layout_questions(answer_key):
+    """The layout of an answer key: [[question_id, [option_ids], [correct_ids]], ...] sorted by id."""
+    return [
+        [question_id, sorted(answer_key.options[question_id]), sorted(answer_key.correct[question_id])]
+        for question_id in sorted(answer_key.options)
+    ]
+
+
+def _fingerprint(quiz_id, questions):
+    text = json.dumps([quiz_id, questions], separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _compile(layout_id, quiz_id, questions):
+    compiled = []
+    positions = {}
+    offset = 0
+    for question_id, option_ids, correct_ids in questions:
+        correct = frozenset(correct_ids)
+        compiled.append((question_id, tuple(option_ids), correct, offset))
+        positions[question_id] = (offset, {option_id: bit for bit, option_id in enumerate(option_ids)}, correct)
+        offset += (len(option_ids) + 7) // 8
+    return Layout(layout_id, quiz_id, tuple(compiled), positions, offset)
+
+
+def layout_for(connection, answer_key):
+    """The layout of an answer key, created in the caller's transaction if it is new."""
+    questions = layout_questions(answer_key)
+    fingerprint = _fingerprint(answer_key.quiz_id, questions)
+    layout_id = _layout_ids.get(fingerprint)
+    if layout_id is not None:
+        return _layouts[layout_id]
+
+    inserted = connection.execute(
+        sqlite_insert(QuizLayout.__table__)
+        .values(quiz_id=answer_key.quiz_id, fingerprint=fingerprint,
+                questions=json.dumps(questions, separators=(',', ':')))
+        .on_conflict_do_nothing(index_elements=['fingerprint'])
+    )
+    layout_id = connection.execute(
+        select(QuizLayout.id).where(QuizLayout.fingerprint == fingerprint)
+    ).scalar_one()
+    layout = _compile(layout_id, answer_key.quiz_id, questions)
+    if inserted.rowcount == 0:
+        # Already committed: safe to remember. A layout created here is
+        # only cached by the next lookup, in case this transaction rolls back.
+        with _lock:
+            _layouts[layout_id] = layout
+            _layout_ids[fingerprint] = layout_id
+    return layout
+
+
+def get_layout(connection, layout_id):
+    layout = _layouts.get(layout_id)
+    if layout is None:
+        quiz_id, questions = connection.execute(
+            select(QuizLayout.quiz_id, QuizLayout.questions).where(QuizLayout.id == layout_id)
+        ).one()
+        layout = _compile(layout_id, quiz_id, json.loads(questions))
+        with _lock:
+            _layouts[layout_id] = layout
+    return layout
+
+
+def encode(layout, answers):
+    """Pack (question_id, option_id, is_correct) tuples into masks.
+
+    Raises ValueError for an answer the layout cannot reproduce exactly:
+    an option it does not have, or a different is_correct.
+    """
+    masks = bytearray(layout.size)
+    for question_id, option_id, is_correct in answers:
+        try:
+            offset, bits, correct = layout.positions[question_id]
+            bit = bits[option_id]
+        except KeyError:
+            raise ValueError(f'Option {option_id} of question {question_id} is not in layout {layout.id}')
+        if bool(is_correct) != (option_id in correct):
+            raise ValueError(f'Option {option_id} has another is_correct in layout {layout.id}')
+        masks[offset + bit // 8] |= 1 << (bit % 8)
+    return bytes(masks).rstrip(b'\0')  # Unanswered trailing questions cost nothing
+
+
+def decode(layout, masks):
+    """The (question_id, option_id, is_correct) tuples of packed masks, in layout order."""
+    for question_id, option_ids, correct, offset in layout.questions:
+        for bit, option_id in enumerate(option_ids):
+            index = offset + bit // 8
+            if index < len(masks) and masks[index] >> (bit % 8) & 1:
+                yield question_id, option_id, option_id in correct
+
+
+def write(connection, attempts, packed=None):
+    """Store the answers of scored attempts in the caller's transaction.
+
+    attempts is a list of (attempt_id, quiz_id, answers) with answers as in
+    ScoreResult.answers. In packed mode an attempt that does not fit the
+    current layout of its quiz (edited since it was scored) keeps plain rows.
+    """
+    if packed is None:
+        packed = current_app.config.get('ANSWER_STORAGE', 'rows') == 'packed'
+    rows = []
+    packed_rows = []
+    layouts = {}
+    for attempt_id, quiz_id, answers in attempts:
+        if not answers:
+            continue
+        if packed:
+            if quiz_id not in layouts:
+                layouts[quiz_id] = layout_for(connection, quiz_cache.get_answer_key(quiz_id))
+            layout = layouts[quiz_id]
+            try:
+                packed_rows.append({'attempt_id': attempt_id, 'layout_id': layout.id,
+                                    'masks': encode(layout, answers)})
+                continue
+            except ValueError:
+                pass
+        rows.extend(
+            {'attempt_id': attempt_id, 'question_id': question_id, 'option_id': option_id, 'is_correct': is_correct}
+            for question_id, option_id, is_correct in answers
+        )
+    if rows:
+        connection.execute(Answer.__table__.insert(), rows)
+    if packed_rows:
+        connection.execute(PackedAnswer.__table__.insert(), packed_rows)
+
+
+def answer_rows(connection, attempt_ids):
+    """Per-option rows of the given attempts, whatever their storage, by attempt, question and option."""
+    rows = [
+        AnswerRow(*row) for row in connection.execute(
+            select(Answer.id, Answer.attempt_id, Answer.question_id, Answer.option_id, Answer.is_correct)
+            .where(Answer.attempt_id.in_(attempt_ids))
+        )
+    ]
+    packed = connection.execute(
+        select(PackedAnswer.attempt_id, PackedAnswer.layout_id, PackedAnswer.masks)
+        .where(PackedAnswer.attempt_id.in_(attempt_ids))
+    )
+    for attempt_id, layout_id, masks in packed:
+        layout = get_layout(connection, layout_id)
+        # No row id of their own: number them within the attempt
+        rows.extend(AnswerRow(f'{attempt_id}-{n}', attempt_id, *answer)
+                    for n, answer in enumerate(decode(layout, masks)))
+    rows.sort(key=lambda row: (row.attempt_id, row.question_id, row.option_id))
+    return rows
+
+
+def attempt_answers(attempt_id):
+    return answer_rows(db.session, [attempt_id])
+
+
+def iter_answer_rows(connection, batch_size=BATCH_SIZE):
+    """Every per-option answer row of the database, by attempt; for analytics and exports."""
+    last_id = 0
+    while True:
+        attempt_ids = connection.execute(
+            select(Attempt.id).where(Attempt.id > last_id).order_by(Attempt.id).limit(batch_size)
+        ).scalars().all()
+        if not attempt_ids:
+            return
+        yield from answer_rows(connection, attempt_ids)
+        last_id = attempt_ids[-1]
+
+
+def pack_existing(batch_size=BATCH_SIZE, progress=None):
+    """Convert Answers rows to PackedAnswers, one transaction per batch of attempts.
+
+    Attempts whose rows the current layout of their quiz cannot reproduce
+    exactly (the quiz was edited after they were taken, duplicate rows)
+    are left as rows. Returns (attempts packed, attempts left as rows, rows removed).
+    """
+    packed_count = kept = removed = 0
+    last_id = 0
+    answer_keys = {}
+    while True:
+        attempt_ids = db.session.execute(
+            select(Answer.attempt_id).distinct().where(Answer.attempt_id > last_id)
+            .order_by(Answer.attempt_id).limit(batch_size)
+        ).scalars().all()
+        if not attempt_ids:
+            return packed_count, kept, removed
+        last_id = attempt_ids[-1]
+
+        answers = {}
+        quiz_ids = {}
+        for attempt_id, quiz_id, question_id, option_id, is_correct in db.session.execute(
+                select(Answer.attempt_id, Attempt.quiz_id, Answer.question_id, Answer.option_id, Answer.is_correct)
+                .join(Attempt, Attempt.id == Answer.attempt_id)
+                .where(Answer.attempt_id.in_(attempt_ids))):
+            answers.setdefault(attempt_id, []).append((question_id, option_id, is_correct))
+            quiz_ids[attempt_id] = quiz_id
+
+        packed_rows = []
+        for attempt_id, selected in answers.items():
+            quiz_id = quiz_ids[attempt_id]
+            if quiz_id not in answer_keys:
+                answer_keys[quiz_id] = quiz_cache.load_answer_key(quiz_id)
+            layout = layout_for(db.session, answer_keys[quiz_id])
+            if len(set(selected)) != len(selected):
+                kept += 1
+                continue
+            try:
+                packed_rows.append({'attempt_id': attempt_id, 'layout_id': layout.id,
+                                    'masks': encode(layout, selected)})
+            except ValueError:
+                kept += 1
+
+        if packed_rows:
+            db.session.execute(PackedAnswer.__table__.insert(), packed_rows)
+            removed += db.session.execute(
+                delete(Answer).where(Answer.attempt_id.in_([row['attempt_id'] for row in packed_rows]))
+            ).rowcount
+        db.session.commit()
+        packed_count += len(packed_rows)
+        if progress:
+            progress(packed_count, kept)
+
+
+def unpack_existing(batch_size=BATCH_SIZE, progress=None):
+    """Convert PackedAnswers back to Answers rows; returns (attempts unpacked, rows created)."""
+    unpacked = created = 0
+    while True:
+        packed = db.session.execute(
+            select(PackedAnswer.attempt_id, PackedAnswer.layout_id, PackedAnswer.masks)
+            .order_by(PackedAnswer.attempt_id).limit(batch_size)
+        ).all()
+        if not packed:
+            return unpacked, created
+
+        rows = []
+        for attempt_id, layout_id, masks in packed:
+            layout = get_layout(db.session, layout_id)
+            rows.extend(
+                {'attempt_id': attempt_id, 'question_id': question_id, 'option_id': option_id,
+                 'is_correct': is_correct}
+                for question_id, option_id, is_correct in decode(layout, masks)
+            )
+        if rows:
+            db.session.execute(Answer.__table__.insert(), rows)
+        db.session.execute(
+            delete(PackedAnswer).where(PackedAnswer.attempt_id.in_([row.attempt_id for row in packed]))
+        )
+        db.session.commit()
+        unpacked += len(packed)
+        created += len(rows)
+        if progress:
+            progress(unpacked, 0)
+
+
+def vacuum():
+    # SQLite keeps the freed pages in the file until it is rebuilt
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql('VACUUM')
+
+
+def init_app(app):
+    @app.cli.command('pack-answers')
+    @click.option('--unpack', is_flag=True, help='Convert packed answers back to one row per option.')
+    @click.option('--batch-size', type=int, default=BATCH_SIZE, help='Attempts per transaction.')
+    @click.option('--vacuum', 'run_vacuum', is_flag=True, help='Rebuild the database file afterwards to reclaim the space.')
+    def pack_answers_command(unpack, batch_size, run_vacuum):
+        """Convert the stored answers to the packed format (or back with --unpack).
+
+        Set ANSWER_STORAGE accordingly for the attempts written afterwards;
+        both formats can be read at any time, so this can run on a live database.
+        """
+        db.create_all()  # PackedAnswers and QuizLayouts on an older database
+        started = time.perf_counter()
+
+        batches = [0]
+
+        def progress(done, kept):
+            batches[0] += 1
+            if batches[0] % 100:
+                return  # One line per 100 transactions
+            click.echo(f'  {done} attempts converted, {kept} left as they were ({time.perf_counter() - started:.0f}s)')
+
+        if unpack:
+            attempts, rows = unpack_existing(batch_size, progress)
+            click.echo(f'{attempts} attempts unpacked into {rows} answer rows.')
+        else:
+            attempts, kept, rows = pack_existing(batch_size, progress)
+            click.echo(f'{attempts} attempts packed, replacing {rows} answer rows; '
+                       f'{kept} attempts no longer match their quiz and stay as rows.')
+        if run_vacuum:
+            db.session.remove()
+            vacuum()
+            click.echo('Database file rebuilt.')
@@ -1,18 +1,57 @@
+import os
 from flask import Flask, render_template, redirect, url_for, session, request
 from flask_login import LoginManager
+from jinja2 import FileSystemBytecodeCache
 from models import db, Admin, User
 from auth import auth_bp
 from admin import admin_bp
+import database
+import migrations
+import stats
+import identity_cache
+import hashing
+import user_import
+import quiz_io
+import submissions
+import drafts
+import answer_store
+import profiler
+import monitoring
+import dataset
+import assets
+import compression
 
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SECRET_KEY'] = 'your_secret_key'
+app.config.from_object('config')
+app.config.from_envvar('APP_SETTINGS', silent=True)
+
+# Persistent bytecode cache for compiled templates
+jinja_cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+if jinja_cache_dir is None:
+    jinja_cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+if jinja_cache_dir:
+    os.makedirs(jinja_cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
 
 # Initialize Flask extensions with the app
-db.init_app(app)
+database.init_app(app)  # Calls db.init_app with the configured DB_PROFILE
 login_manager = LoginManager(app)
 login_manager.login_view = 'auth.login'
+submissions.init_app(app)
+drafts.init_app(app)  # Autosave writer
+answer_store.init_app(app)  # flask pack-answers
+migrations.init_app(app)  # flask upgrade-db
+stats.init_app(app)  # flask rebuild-stats
+identity_cache.init_app(app)
+hashing.init_app(app)
+user_import.init_app(app)  # flask import-users
+quiz_io.init_app(app)  # flask import-quiz / export-quiz
+profiler.init_app(app)  # PROFILER_ENABLED=1
+monitoring.init_app(app)  # /metrics
+dataset.init_app(app)  # flask generate-data
+assets.init_app(app)  # asset_url() in templates, flask build-assets
+compression.init_app(app)
 
 # Register the Blueprint
 app.register_blueprint(auth_bp, url_prefix='/')
@@ -22,6 +61,10 @@ app.register_blueprint(admin_bp, url_prefix='/admin')
 
 @login_manager.user_loader
 def load_user(user_id):
+    # Served from the identity cache; the database is only hit on a miss
+    return identity_cache.cache.get_or_load(user_id, load_principal)
+
+def load_principal(user_id):
     if user_id.startswith('user_'):
         user_id = user_id.replace('user_', '')
         return User.query.get(int(user_id))
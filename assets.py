@@ -0,0 +1,276 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import abort, request, send_file, url_for
+
+# Build step for the files in static/: each one is minified (SVG, CSS, JS),
+# copied under a name containing a hash of its content (logo-azura.3f2a9c1e.svg)
+# and, for text formats, precompressed as .gz and .br next to it. The names
+# never change for a given content, so they are served with a one year
+# immutable cache lifetime; templates get the current name from asset_url().
+
+MANIFEST = 'manifest.json'
+
+# Text formats are minified and precompressed; images only fingerprinted
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+SKIPPED = ('.map',)  # Source maps: development only
+
+# Decimals kept in SVG path data. T.svg is a traced bitmap with six
+# decimals per coordinate; one is far below a pixel at its 932x582 size.
+SVG_PRECISION = 1
+
+MAX_AGE = 365 * 24 * 3600
+
+_manifest = {}  # 'css/bootstrap.min.css' -> 'css/bootstrap.min.3b1f0c2a.css'
+_served = set()
+
+
+# One number of SVG path data. Numbers may be packed without separators:
+# '-.06.63' is -.06 then .63, '1e-3-2' is 1e-3 then -2
+PATH_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+PATH_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def path_tokens(data):
+    """Split path data into ('command', letter), ('flag', '0' or '1') and ('number', text) tokens.
+
+    Raises ValueError on anything else.
+    """
+    tokens = []
+    command = None
+    argument = 0
+    position = PATH_SEPARATORS.match(data).end()
+    while position < len(data):
+        char = data[position]
+        if char.isalpha():
+            tokens.append(('command', char))
+            command, argument = char, 0
+            position += 1
+        elif command in ('A', 'a') and argument % 7 in (3, 4):
+            # Arc flags are single digits and may be packed too: 'a1 1 0 01.5 2'
+            if char not in '01':
+                raise ValueError(f'Invalid arc flag {char!r}')
+            tokens.append(('flag', char))
+            argument += 1
+            position += 1
+        else:
+            match = PATH_NUMBER.match(data, position)
+            if not match:
+                raise ValueError(f'Invalid path data at {data[position:position + 10]!r}')
+            tokens.append(('number', match.group()))
+            argument += 1
+            position = match.end()
+        position = PATH_SEPARATORS.match(data, position).end()
+    return tokens
+
+
+def minify_svg(text, precision=SVG_PRECISION):
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.S)
+    text = re.sub(r'<metadata.*?</metadata>', '', text, flags=re.S)
+
+    def round_number(number):
+        rounded = f'{float(number):.{precision}f}'.rstrip('0').rstrip('.')
+        return '0' if rounded in ('', '-0') else rounded
+
+    def path_data(match):
+        try:
+            tokens = path_tokens(match.group(2))
+        except ValueError:
+            return match.group()  # Not something we understand: keep it as it is
+        data = []
+        after_value = False
+        for kind, token in tokens:
+            if kind == 'command':
+                data.append(token)
+                after_value = False
+                continue
+            value = round_number(token) if kind == 'number' else token
+            # Only a minus sign can separate two values by itself
+            if after_value and not value.startswith('-'):
+                data.append(' ')
+            data.append(value)
+            after_value = True
+        return f'{match.group(1)}"{"".join(data)}"'
+
+    text = re.sub(r'(\sd=)"([^"]*)"', path_data, text)
+    # Attribute values that are the defaults anyway
+    text = re.sub(r'\sopacity="1(\.0*)?"', '', text)
+    text = re.sub(r'(<path[^>]*?)\sstroke="none"', r'\1', text)
+    text = re.sub(r'>\s+<', '><', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)  # Also drops sourceMappingURL comments
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Only the bundled libraries are large and they ship minified already;
+    # rewriting JS safely needs a real parser, so just drop source map links
+    return re.sub(r'^//# sourceMappingURL=.*$', '', text, flags=re.M).rstrip() + '\n'
+
+
+MINIFIERS = {'.svg': minify_svg, '.css': minify_css, '.js': minify_js}
+
+
+def _write(path, content):
+    # Several workers may build at startup: write aside, then rename atomically
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(content)
+    os.replace(temporary, path)
+
+
+def _rewrite_css_urls(text, logical_dir, manifest):
+    # url('T.jpg') in style-Quiz.css must point to the fingerprinted image
+    def replace(match):
+        target = match.group(2)
+        if re.match(r'^(data:|https?:|//|/)', target):
+            return match.group()
+        resolved = posixpath.normpath(posixpath.join(logical_dir, target))
+        if resolved not in manifest:
+            return match.group()
+        return f"url({match.group(1)}{posixpath.relpath(manifest[resolved], logical_dir or '.')}{match.group(1)})"
+
+    return re.sub(r'''url\((['"]?)([^'")]+)\1\)''', replace, text)
+
+
+def build(static_dir, output_dir):
+    """Build every asset of static_dir into output_dir; returns the manifest."""
+    try:
+        import brotli  # Optional: browsers all accept gzip as well
+    except ImportError:
+        brotli = None
+        print("brotli is not installed, assets are only precompressed with gzip")
+
+    sources = []
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root).startswith(os.path.abspath(output_dir)):
+            continue
+        for name in files:
+            path = os.path.join(root, name)
+            logical = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            if not logical.endswith(SKIPPED):
+                sources.append(logical)
+    # Stylesheets last, so the files they reference already have their names
+    sources.sort(key=lambda logical: (logical.endswith('.css'), logical))
+
+    manifest = {}
+    for logical in sources:
+        with open(os.path.join(static_dir, logical), 'rb') as f:
+            content = f.read()
+        extension = os.path.splitext(logical)[1].lower()
+
+        if extension in MINIFIERS:
+            text = content.decode('utf-8')
+            if extension == '.css':
+                text = _rewrite_css_urls(text, posixpath.dirname(logical), manifest)
+            content = MINIFIERS[extension](text).encode('utf-8')
+
+        digest = hashlib.sha256(content).hexdigest()[:10]
+        base, _ = os.path.splitext(logical)
+        fingerprinted = f'{base}.{digest}{extension}'
+        manifest[logical] = fingerprinted
+
+        target = os.path.join(output_dir, fingerprinted)
+        if os.path.exists(target):
+            continue  # Same name, same content
+        if extension in COMPRESSIBLE:
+            gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(gzipped) < len(content):
+                _write(target + '.gz', gzipped)
+            if brotli is not None:
+                compressed = brotli.compress(content, quality=11)
+                if len(compressed) < len(content):
+                    _write(target + '.br', compressed)
+        _write(target, content)
+
+    _write(os.path.join(output_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def is_stale(static_dir, output_dir):
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return True
+    built = os.path.getmtime(manifest_path)
+    if os.path.getmtime(__file__) > built:
+        return True  # The build itself changed (e.g. a minifier fix)
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root).startswith(os.path.abspath(output_dir)):
+            continue
+        if any(os.path.getmtime(os.path.join(root, name)) > built for name in files):
+            return True
+    return False
+
+
+def load(output_dir):
+    global _manifest, _served
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            _manifest = json.load(f)
+    else:
+        _manifest = {}
+    _served = set(_manifest.values())
+
+
+def asset_url(filename):
+    """URL of a static file: its fingerprinted build if there is one, else the plain static file."""
+    fingerprinted = _manifest.get(filename)
+    if fingerprinted is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=fingerprinted)
+
+
+def init_app(app):
+    output_dir = app.config.get('ASSETS_DIR') or os.path.join(app.static_folder, 'dist')
+
+    if app.config.get('ASSETS_BUILD_ON_STARTUP', True) and is_stale(app.static_folder, output_dir):
+        print(f"Building static assets into {output_dir}")
+        build(app.static_folder, output_dir)
+    load(output_dir)
+
+    def serve_asset(filename):
+        if filename not in _served:
+            abort(404)  # Only built files, never anything else on disk
+        path = os.path.join(output_dir, filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+        encoding = None
+        if filename.endswith(COMPRESSIBLE):
+            for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if request.accept_encodings[candidate] and os.path.exists(path + suffix):
+                    encoding, path = candidate, path + suffix
+                    break
+
+        # The name already identifies the content; the encoding tells variants apart
+        response = send_file(path, mimetype=mimetype, conditional=True,
+                             etag=f"{filename.rsplit('.', 2)[-2]}-{encoding or 'identity'}")
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if filename.endswith(COMPRESSIBLE):
+            response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, immutable'
+        return response
+
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Minify, fingerprint and precompress the files of static/."""
+        manifest = build(app.static_folder, output_dir)
+        load(output_dir)
+        click.echo(f'{len(manifest)} assets built into {output_dir}.')
@@ -1,10 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session, make_response, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session, make_response, flash, jsonify, Response
 from flask_login import login_user as user_login_user, logout_user as user_logout_user, login_required as user_login_required, current_user as user_current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User, Quiz, Question, QuestionTranslation, Option, OptionTranslation, Attempt, Answer
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 import pytz 
 import uuid
+import json
+import quiz_cache
+import scoring
+import submissions
+import stats
+import identity_cache
+import hashing
+import drafts
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -33,13 +41,18 @@ def register():
                 flash('A user with this CIN already exists.', 'error')
             return redirect(url_for('auth.login'))
 
-        # Create new user
-        hashed_password = generate_password_hash(password)
+        # Create new user; the hash is computed in the hashing process pool
+        try:
+            hashed_password = hashing.service.generate(password)
+        except hashing.HashingBusy:
+            flash('The server is busy, please try again in a moment.', 'error')
+            return redirect(url_for('auth.register'))
         new_user = User(emp_id=emp_id, cin=cin, first_name=first_name, last_name=last_name,
                         service=service, site=site, password=hashed_password)
 
         try:
             db.session.add(new_user)
+            stats.record_users(db.session, [(site, service)])
             db.session.commit()
             flash('Account created successfully!', 'success')
             return redirect(url_for('auth.login'))
@@ -64,13 +77,29 @@ def login():
         emp_id = request.form.get('emp_id')
         password = request.form.get('password')
 
+        # Stop guessing early, before spending a hash on it. Tablets share
+        # the plant's address, so failures are counted per address and account.
+        client = (request.remote_addr, emp_id)
+        if hashing.throttle.is_blocked(client):
+            flash('Too many failed login attempts. Please wait a few minutes and try again.', 'error')
+            return redirect(url_for('auth.login'))
+
         user = User.query.filter_by(emp_id=emp_id).first()
 
-        if user and check_password_hash(user.password, password):
+        try:
+            valid = user is not None and hashing.service.check(user.password, password)
+        except hashing.HashingBusy:
+            flash('The server is busy, please try again in a moment.', 'error')
+            return redirect(url_for('auth.login'))
+
+        if valid:
+            hashing.throttle.reset(client)
+            hashing.rehash_if_needed(user, password)
             user_login_user(user)
             flash('Login successful!', 'success')
             return redirect(url_for('auth.explanation'))
         else:
+            hashing.throttle.record_failure(client)
             flash('Login failed. Check your emp_id and/or password.', 'error')
             return redirect(url_for('auth.login'))
 
@@ -81,6 +110,7 @@ def login():
 @auth_bp.route('/logout')
 @user_login_required
 def logout():
+    identity_cache.cache.invalidate(user_current_user.get_id())
     user_logout_user()
     flash('Logged out successfully!', 'success')
     session.clear()
@@ -90,11 +120,13 @@ def logout():
 @user_login_required
 def explanation():
     # Check if the user has already attempted this quiz
-    active_quiz = Quiz.query.filter_by(is_active=True).first()
+    language = session.get('language', 'fr')
+    active_quiz = quiz_cache.get_active_quiz(language)
+    if not active_quiz:
+        return "No active quiz found.", 404
     attempt = Attempt.query.filter_by(user_id=user_current_user.id, quiz_id=active_quiz.id).first()
     if attempt:
         return redirect(url_for('auth.show_result', status=attempt.status))
-    language = session.get('language', 'fr')
     return render_template(f'explanation_{language}.html')
 
 @auth_bp.route('/quiz')
@@ -104,14 +136,15 @@ def quiz():
         return redirect(url_for('auth.login'))  # Redirect to login if not authenticated
 
     try:
-        # Fetch the active quiz
-        active_quiz = Quiz.query.filter_by(is_active=True).first()
+        # Fetch the compiled snapshot of the active quiz for this language
+        language = session.get('language', 'fr')
+        quiz_data = quiz_cache.get_active_quiz(language)
 
-        if not active_quiz:
+        if not quiz_data:
             return "No active quiz found.", 404
 
         # Check if the user has already attempted this quiz
-        attempt = Attempt.query.filter_by(user_id=user_current_user.id, quiz_id=active_quiz.id).first()
+        attempt = Attempt.query.filter_by(user_id=user_current_user.id, quiz_id=quiz_data.id).first()
         if attempt:
             return redirect(url_for('auth.show_result', status=attempt.status))
 
@@ -123,56 +156,13 @@ def quiz():
         csrf_token = str(uuid.uuid4())
         session['csrf_token'] = csrf_token
 
-        # Fetch quiz with related questions and options
-        quiz = Quiz.query.options(
-            db.joinedload(Quiz.questions).joinedload(Question.options)
-        ).get_or_404(active_quiz.id)
-
-        # Fetch translations for questions and options
-        language = session.get('language', 'fr')  
-        print(session.get('language'))
-        print(language)
-        questions_translations = (
-            QuestionTranslation.query.filter(QuestionTranslation.language == language)
-            .all()
-        )
-        options_translations = (
-            OptionTranslation.query.filter(OptionTranslation.language == language)
-            .all()
-        )
-
-        # Convert translations to dictionaries for easy lookup
-        questions_translations_dict = {qt.question_id: qt.title for qt in questions_translations}
-        options_translations_dict = {ot.option_id: ot.text for ot in options_translations}
-
-        # Prepare data for rendering
-        quiz_data = {
-            'id': quiz.id,
-            'title': quiz.title,
-            'questions': [
-                {
-                    'id': question.id,
-                    'title': questions_translations_dict.get(question.id, question.title),
-                    'options': [
-                        {
-                            'id': option.id,
-                            'text': options_translations_dict.get(option.id, option.text),
-                            'is_correct': option.is_correct
-                        }
-                        for option in question.options
-                    ]
-                }
-                for question in quiz.questions
-            ]
-        }
-
         # Debugging: Print session and quiz details
         print(f"Session Start Time: {session['start_time']}")
         print(f"User ID: {user_current_user.id}")
 
         #template_name = f'quiz_{language}.html'
         template_name = f'quiz_{language}.html'
-        response = make_response(render_template(template_name, quiz=quiz_data, start_time=session['start_time'], csrf_token=csrf_token))
+        response = make_response(quiz_cache.render_quiz_page(template_name, quiz_data, csrf_token, session['start_time']))
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
@@ -209,102 +199,21 @@ def submit_quiz(quiz_id):
         flash('Invalid or missing CSRF token. Please try submitting the quiz again.', 'error')
         return redirect(url_for('auth.quiz', quiz_id=quiz_id))  # Adjust URL if needed
 
-    # Define the passing score threshold (as a percentage)
-    PASSING_SCORE_PERCENTAGE = 75  # Example: 25% passing score
-
-    final_score = 0
-    question_scores = {}
-
     try:
-        # Fetch the quiz and its related data
-        quiz = Quiz.query.get_or_404(quiz_id)
-
-        for key, value in request.form.items():
-            if key.startswith('question_'):
-                parts = key.split('_')
-                if len(parts) != 2 or not parts[1].isdigit():
-                    continue
-
-                try:
-                    question_id = int(parts[1])
-                except ValueError:
-                    continue  # Skip invalid keys
-
-                selected_options = request.form.getlist(key)
-                question_scores[question_id] = {'correct': 0, 'incorrect': 0}
-
-                question = Question.query.get_or_404(question_id)
-                total_options = Option.query.filter_by(question_id=question_id).count()
-                correct_options_count = Option.query.filter_by(question_id=question_id, is_correct=True).count()
-
-                for option_id in selected_options:
-                    try:
-                        option_id = int(option_id)
-                    except ValueError:
-                        continue  # Skip invalid option IDs
-
-                    option = Option.query.get_or_404(option_id)
-
-                    if option.is_correct:
-                        question_scores[question_id]['correct'] += 1
-                    else:
-                        question_scores[question_id]['incorrect'] += 1
-
-                correct_count = question_scores[question_id]['correct']
-                incorrect_count = question_scores[question_id]['incorrect']
-
-                if incorrect_count == 0:
-                    if correct_count == correct_options_count:
-                        final_score += 4
-                    else:
-                        final_score += correct_count
-                else:
-                    if correct_count == 0:
-                        final_score -= incorrect_count
-                    else:
-                        final_score += correct_count - incorrect_count
-
-        total_questions = len(question_scores)
-        max_score = total_questions * 4
-
-        percentage_score = (final_score / max_score) * 100 if max_score > 0 else 0
-        status = 'Passed' if percentage_score >= PASSING_SCORE_PERCENTAGE else 'Failed'
-
-        attempt = Attempt(
-            user_id=user_id,
-            quiz_id=quiz_id,
-            score=final_score,
-            status=status,
-            time=end_time
-        )
-        db.session.add(attempt)
-        db.session.commit()
-
-        attempt_id = attempt.id
-
-        for question_id in question_scores.keys():
-            selected_options = request.form.getlist(f'question_{question_id}')
-            for option_id in selected_options:
-                try:
-                    option_id = int(option_id)
-                except ValueError:
-                    continue  # Skip invalid option IDs
-
-                option = Option.query.get_or_404(option_id)
-                answer = Answer(
-                    attempt_id=attempt_id,
-                    question_id=question_id,
-                    option_id=option_id,
-                    is_correct=option.is_correct
-                )
-                db.session.add(answer)
-
-        db.session.commit()
+        try:
+            status, created = store_submission(user_id, quiz_id, scoring.selections_from_form(request.form), end_time)
+        except scoring.InvalidSubmission as e:
+            print(f"Invalid submission: {e}")
+            return "Invalid submission", 400
+        except submissions.WriterBusy as e:
+            print(f"Submission rejected: {e}")
+            return "The server is busy, please submit the quiz again", 503
 
-        session.pop('start_time', None)  # Clear the start_time from session after submission
+        if created:
+            session.pop('start_time', None)  # Clear the start_time from session after submission
 
         # Create a response to prevent caching
-        response = make_response(redirect(url_for('auth.show_result', status=attempt.status)))
+        response = make_response(redirect(url_for('auth.show_result', status=status)))
         response.headers['Cache-Control'] = 'no-store'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
@@ -315,6 +224,32 @@ def submit_quiz(quiz_id):
         print(f"Error occurred: {e}")
         return "An error occurred while processing your submission", 500
 
+def store_submission(user_id, quiz_id, selections, end_time):
+    """Score a submission and store it; returns (status, created).
+
+    created is False when the user had already submitted this quiz, and
+    status is then the one of the stored attempt. Raises
+    scoring.InvalidSubmission and submissions.WriterBusy.
+    """
+    # Fetch the quiz and its answer key (cached across submissions)
+    quiz = Quiz.query.get_or_404(quiz_id)
+    answer_key = quiz_cache.get_answer_key(quiz.id)
+    result = scoring.score_submission(answer_key, selections)
+
+    # Attempt and answers are written in one transaction, which also deletes
+    # the autosaved draft, possibly grouped with other submissions by the
+    # group-commit writer
+    try:
+        submissions.persist(user_id, quiz_id, result, end_time)
+    except IntegrityError:
+        # Already submitted: only one attempt per user per quiz is stored
+        db.session.rollback()
+        attempt = Attempt.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
+        if attempt is None:
+            raise
+        return attempt.status, False
+    return result.status, True
+
 @auth_bp.route('/result', methods=['GET'])
 @user_login_required
 def show_result():
@@ -323,6 +258,98 @@ def show_result():
     return render_template(f'finish_{language}.html', status=status)
 
 
+# JSON API for lightweight clients: the same flow as /quiz and /submit_quiz
+@auth_bp.route('/api/quiz')
+@user_login_required
+def api_quiz():
+    language = session.get('language', 'fr')
+    quiz_data = quiz_cache.get_active_quiz(language)
+    if not quiz_data:
+        return jsonify(error='no_active_quiz'), 404
+
+    attempt = Attempt.query.filter_by(user_id=user_current_user.id, quiz_id=quiz_data.id).first()
+    if attempt:
+        return jsonify(error='already_submitted', status=attempt.status), 409
+
+    if 'start_time' not in session:
+        session['start_time'] = datetime.now(pytz.utc).isoformat()
+    csrf_token = str(uuid.uuid4())
+    session['csrf_token'] = csrf_token
+
+    # The quiz itself is serialized once per snapshot; only the per-user
+    # values are added here
+    body = '{"csrf_token":%s,"start_time":%s,"quiz":%s}' % (
+        json.dumps(csrf_token), json.dumps(session['start_time']), quiz_cache.quiz_json(quiz_data))
+    response = Response(body, mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@auth_bp.route('/api/submit_quiz/<int:quiz_id>', methods=['POST'])
+@user_login_required
+def api_submit_quiz(quiz_id):
+    """Body: {"<question_id>": [option_ids], ...} on top of the autosaved draft; the CSRF token goes in the X-CSRF-Token header."""
+    end_time = datetime.utcnow()
+    if not session.get('start_time'):
+        return jsonify(error='quiz_not_started'), 400
+
+    session_token = session.pop('csrf_token', None)
+    if not session_token or session_token != request.headers.get('X-CSRF-Token'):
+        return jsonify(error='invalid_csrf_token'), 400
+
+    try:
+        # The autosaved draft is promoted: the body only needs what was not autosaved yet
+        selections = drafts.load(user_current_user.id, quiz_id)
+        # [] in the body clears an autosaved answer; score_submission skips it
+        selections.update(scoring.selections_from_json(request.get_json(silent=True), keep_empty=True))
+        status, created = store_submission(user_current_user.id, quiz_id, selections, end_time)
+    except scoring.InvalidSubmission as e:
+        print(f"Invalid submission: {e}")
+        return jsonify(error='invalid_submission', message=str(e)), 400
+    except submissions.WriterBusy as e:
+        print(f"Submission rejected: {e}")
+        return jsonify(error='busy'), 503
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error occurred: {e}")
+        return jsonify(error='server_error'), 500
+
+    if created:
+        session.pop('start_time', None)
+    response = jsonify(status=status, result_url=url_for('auth.show_result', status=status))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@auth_bp.route('/api/autosave/<int:quiz_id>', methods=['GET', 'POST'])
+@user_login_required
+def autosave(quiz_id):
+    """GET: the saved draft. POST: a delta {"<question_id>": [option_ids]} of the questions that changed."""
+    if request.method == 'GET':
+        response = jsonify(drafts.load(user_current_user.id, quiz_id))
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    attempt = Attempt.query.filter_by(user_id=user_current_user.id, quiz_id=quiz_id).first()
+    if attempt:
+        return jsonify(error='already_submitted', status=attempt.status), 409
+    if not session.get('start_time'):
+        return jsonify(error='quiz_not_started'), 400
+    try:
+        delta = scoring.selections_from_json(request.get_json(silent=True), keep_empty=True)  # [] = unchecked
+        scoring.validate_selections(quiz_cache.get_answer_key(quiz_id), delta)
+    except scoring.InvalidSubmission as e:
+        return jsonify(error='invalid_submission', message=str(e)), 400
+
+    # Written together with the other autosaves of the same moment; the
+    # connection goes back to the pool while waiting for that batch
+    db.session.close()
+    try:
+        drafts.save(user_current_user.id, quiz_id, delta)
+    except Exception as e:
+        print(f"Autosave failed: {e}")
+        return jsonify(error='busy'), 503  # autosave.js sends the delta again later
+    return '', 204
+
+
 
 
 
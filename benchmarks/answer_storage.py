@@ -0,0 +1,147 @@
+"""Compare the size and write cost of the two answer storage formats.
+
+Builds a temporary database with dataset.generate, measures the Answers
+table and its index with SQLite's dbstat, converts everything with
+answer_store.pack_existing (the 'flask pack-answers' migration) and
+measures PackedAnswers and QuizLayouts the same way. The per-option rows
+read back through answer_store.iter_answer_rows must be identical before
+and after. Then SUBMISSIONS attempts are written with
+submissions.save_attempt in each format, one transaction each, as the
+submit route does.
+
+    python benchmarks/answer_storage.py [--users 20000] [--attempts 50000] [--submissions 2000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TABLES = {
+    'rows': ('Answers', 'ix_answers_attempt_id'),
+    'packed': ('PackedAnswers', 'QuizLayouts', 'uq_quiz_layouts_fingerprint'),
+}
+
+
+def storage_bytes(connection, names):
+    placeholders = ', '.join('?' for _ in names)
+    return connection.exec_driver_sql(
+        f'SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN ({placeholders})', tuple(names)).scalar()
+
+
+def all_rows(connection):
+    import answer_store
+    return [row[1:] for row in answer_store.iter_answer_rows(connection)]  # Without the row id
+
+
+def time_submissions(app, storage, users, count, seed):
+    from datetime import datetime
+    from models import db
+    import dataset
+    import quiz_cache
+    import quiz_io
+    import scoring
+    import submissions
+
+    app.config['ANSWER_STORAGE'] = storage
+    rng = random.Random(seed)
+    quiz_id = quiz_io.create_quiz(dataset.synthetic_quiz(rng, 0, 10), is_active=False)
+    key = quiz_cache.get_answer_key(quiz_id)
+    results = [
+        scoring.score_submission(key, {question_id: dataset.pick_options(rng, options, key.correct[question_id], 0.7)
+                                       for question_id, options in key.options.items()})
+        for _ in range(count)
+    ]
+    db.session.remove()
+
+    started = time.perf_counter()
+    for user_id, result in zip(users, results):
+        submissions.save_attempt(user_id, quiz_id, result, datetime.utcnow())
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--quizzes', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--attempts', type=int, default=50000)
+    parser.add_argument('--submissions', type=int, default=2000)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            'DATABASE_URL': 'sqlite:///' + os.path.join(tmp, 'answers.db'),
+            'DB_PROFILE': 'production',
+            'ANSWER_STORAGE': 'rows',
+            'JINJA_BYTECODE_CACHE_DIR': '',
+            'ASSETS_DIR': os.path.join(tmp, 'assets'),
+        })
+        from app import app
+        from models import db, User
+        import answer_store
+        import dataset
+
+        with app.app_context():
+            db.create_all()
+            _, _, _, answer_count = dataset.generate(
+                args.users, args.quizzes, args.questions, args.attempts,
+                list(dataset.SITES), list(dataset.SERVICES), 90, seed=1)
+            db.session.remove()
+            answer_store.vacuum()
+            with db.engine.connect() as connection:
+                rows_bytes = storage_bytes(connection, TABLES['rows'])
+                before = all_rows(connection)
+
+            started = time.perf_counter()
+            packed_count, kept, _ = answer_store.pack_existing()
+            migration_seconds = time.perf_counter() - started
+            db.session.remove()
+            answer_store.vacuum()
+            with db.engine.connect() as connection:
+                packed_bytes = storage_bytes(connection, TABLES['packed'])
+                identical = all_rows(connection) == before
+
+            users = db.session.query(User.id).order_by(User.id).limit(args.submissions).all()
+            users = [user_id for user_id, in users]
+            write_seconds = {storage: time_submissions(app, storage, users, len(users), seed=2)
+                             for storage in ('rows', 'packed')}
+
+    results = {
+        'config': vars(args),
+        'attempts': args.attempts,
+        'answer_rows': answer_count,
+        'rows_bytes': rows_bytes,
+        'packed_bytes': packed_bytes,
+        'size_ratio': round(rows_bytes / packed_bytes, 1) if packed_bytes else None,
+        'migration_seconds': round(migration_seconds, 2),
+        'attempts_packed': packed_count,
+        'attempts_kept_as_rows': kept,
+        'rows_identical_after_migration': identical,
+        'submissions': len(users),
+        'submit_ms': {storage: round(seconds / len(users) * 1000, 3) for storage, seconds in write_seconds.items()},
+    }
+
+    print(f"{args.attempts} attempts, {answer_count} answer rows")
+    print(f"{'rows':<8} {rows_bytes:>12} bytes  {rows_bytes / args.attempts:>8.1f} per attempt")
+    print(f"{'packed':<8} {packed_bytes:>12} bytes  {packed_bytes / args.attempts:>8.1f} per attempt "
+          f"({results['size_ratio']}x smaller)")
+    print(f"Migration: {packed_count} attempts packed, {kept} kept as rows in {migration_seconds:.1f}s; "
+          f"rows read back {'identical' if identical else 'DIFFERENT'}")
+    print(f"save_attempt: rows {results['submit_ms']['rows']} ms, packed {results['submit_ms']['packed']} ms "
+          f"per submission ({len(users)} each)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Compare the bytes sent for the main pages with and without compression and conditional GET.
+
+Builds a temporary database with dataset.generate (plus the real quiz of
+initial/questions.txt as the active one), logs in an employee and an
+admin with Flask's test client, and fetches every page three times:
+
+    before       COMPRESS_ENABLED and CONDITIONAL_GET_ENABLED off, plain /static files
+    after        gzip/brotli accepted, fingerprinted /assets files
+    revalidate   the same request again with If-None-Match (304 when unchanged)
+
+Sizes include the status line and headers.
+
+    python benchmarks/bytes_on_wire.py [--users 2000] [--attempts 5000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ACCEPT_ENCODING = {'Accept-Encoding': 'gzip, deflate, br'}
+
+
+def wire_size(response):
+    headers = sum(len(key) + len(value) + 4 for key, value in response.headers.items())
+    return len(f'HTTP/1.1 {response.status}\r\n') + headers + 2 + len(response.get_data())
+
+
+def setup(users, attempts):
+    from app import app
+    from models import db, Admin, Quiz
+    from werkzeug.security import generate_password_hash
+    import dataset
+    import quiz_io
+
+    with app.app_context():
+        db.create_all()
+        dataset.generate(users, 5, 10, attempts, list(dataset.SITES), list(dataset.SERVICES), 90, seed=1)
+        Quiz.query.update({'is_active': False})
+        db.session.commit()
+        quiz_io.create_quiz(quiz_io.load_file(os.path.join(ROOT, 'initial', 'questions.txt'), 'Bytes on wire'),
+                            is_active=True)
+        db.session.add(Admin(username='bench', password=generate_password_hash('bench', 'pbkdf2:sha256:1000')))
+        db.session.commit()
+    return app
+
+
+def measure(app, client, name, path, static_path=None):
+    app.config['COMPRESS_ENABLED'] = False
+    app.config['CONDITIONAL_GET_ENABLED'] = False
+    before = client.get(static_path or path)
+
+    app.config['COMPRESS_ENABLED'] = True
+    app.config['CONDITIONAL_GET_ENABLED'] = True
+    after = client.get(path, headers=ACCEPT_ENCODING)
+    # A wrong path would otherwise measure the size of a 404 page
+    assert before.status_code == after.status_code == 200, f'{name}: {before.status_code}, {after.status_code}'
+    revalidate = None
+    if after.headers.get('ETag'):
+        revalidate = client.get(path, headers=dict(ACCEPT_ENCODING, **{'If-None-Match': after.headers['ETag']}))
+
+    return {
+        'page': name,
+        'status': after.status_code,
+        'encoding': after.headers.get('Content-Encoding', 'identity'),
+        'before': wire_size(before),
+        'after': wire_size(after),
+        'revalidate': wire_size(revalidate) if revalidate is not None else None,
+        'revalidate_status': revalidate.status_code if revalidate is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--attempts', type=int, default=5000)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            'DATABASE_URL': 'sqlite:///' + os.path.join(tmp, 'bytes.db'),
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+            'JINJA_BYTECODE_CACHE_DIR': '',
+            'ASSETS_DIR': os.path.join(tmp, 'assets'),
+        })
+        app = setup(args.users, args.attempts)
+        from flask import url_for
+        import assets
+
+        results = []
+        employee = app.test_client()
+        with app.test_request_context():
+            employee_pages = {name: url_for(f'auth.{name}') for name in ('quiz', 'explanation')}
+            admin_pages = {name: url_for(endpoint) for name, endpoint in (
+                ('dashboard', 'admin.dashboard'), ('attempts', 'admin.view_attempts'), ('users', 'admin.view_users'),
+                ('metrics.json', 'admin.metrics_json'), ('quizzes', 'admin.quizzes'))}
+
+        employee.post('/login', data={'emp_id': 'EMP0000001', 'password': 'password'})
+        for language in ('fr', 'ar'):
+            employee.get(f'/login/{language}')
+            for name, path in employee_pages.items():
+                results.append(measure(app, employee, f'{name} ({language})', path))
+
+        admin = app.test_client()
+        admin.post('/admin/login', data={'username': 'bench', 'password': 'bench'})
+        for name, path in admin_pages.items():
+            results.append(measure(app, admin, name, path))
+
+        with app.test_request_context():
+            for filename in ('T.svg', 'css/bootstrap.min.css', 'js/bootstrap.bundle.min.js'):
+                results.append(measure(app, admin, filename, assets.asset_url(filename), f'/static/{filename}'))
+
+    print(f"{'page':<28} {'status':>6} {'encoding':>9} {'before':>10} {'after':>10} {'saved':>6} {'revalidate':>11}")
+    for row in results:
+        saved = 1 - row['after'] / row['before'] if row['before'] else 0
+        revalidate = f"{row['revalidate']} ({row['revalidate_status']})" if row['revalidate'] is not None else '-'
+        print(f"{row['page']:<28} {row['status']:>6} {row['encoding']:>9} {row['before']:>10} {row['after']:>10} "
+              f"{saved:>6.0%} {revalidate:>11}")
+    total_before = sum(row['before'] for row in results)
+    total_after = sum(row['after'] for row in results)
+    print(f"{'total':<28} {'':>6} {'':>9} {total_before:>10} {total_after:>10} {1 - total_after / total_before:>6.0%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""Load test a whole exam session against a temporary copy of the app.
+
+Creates a fresh SQLite database in a temporary directory, imports the quiz
+of initial/questions.txt, adds USERS employees and serves the real app on
+a local port. Each simulated employee then goes through
+
+    GET /login -> POST /login -> GET /explanation -> GET /quiz
+    -> POST /submit_quiz/<id> -> GET /result
+
+with CONCURRENCY client threads. With --submit burst (the default) nobody
+submits until every employee has loaded the quiz, then all submissions
+arrive at once, like the timer running out for a whole room. With
+--submit spread each employee submits after a random think time instead.
+
+    python benchmarks/exam_session.py [--users 200] [--concurrency 50]
+                                      [--submit burst|spread] [--db-profile production]
+                                      [--submission-mode group_commit] [--json out.json]
+
+Everything runs offline. Results are printed and optionally written as
+JSON for comparing runs; exits with status 1 if any request failed.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'exam-password'
+
+SUBMIT_URL = re.compile(r'action="/submit_quiz/(\d+)"')
+CSRF_TOKEN = re.compile(r'name="csrf_token" value="([^"]+)"')
+OPTION = re.compile(r'name="question_(\d+)"\s+value="(\d+)"')
+
+
+class Client:
+    """One employee's browser: a keep-alive connection and a cookie jar."""
+
+    def __init__(self, port, recorder):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        self.cookies = {}
+        self.recorder = recorder
+
+    def request(self, name, method, path, form=None, expect=(200,)):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{key}={value}' for key, value in self.cookies.items())
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.connection.close()
+            self.recorder.record(name, time.perf_counter() - start, None, str(e))
+            return None, b''
+        elapsed = time.perf_counter() - start
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            key, _, value = header.split(';', 1)[0].partition('=')
+            self.cookies[key.strip()] = value.strip()
+
+        error = None if response.status in expect else f'HTTP {response.status}'
+        self.recorder.record(name, elapsed, response.status, error)
+        return response, content
+
+    def close(self):
+        self.connection.close()
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # name -> list of seconds
+        self.errors = {}  # name -> {error: count}
+        self.lock = threading.Lock()
+
+    def record(self, name, elapsed, status, error):
+        with self.lock:
+            self.samples.setdefault(name, []).append(elapsed)
+            if error:
+                errors = self.errors.setdefault(name, {})
+                errors[error] = errors.get(error, 0) + 1
+
+
+def percentile(sorted_values, percent):
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[index]
+
+
+def setup(users):
+    """Create the database, quiz and users; returns the Flask app."""
+    from app import app
+    from models import db
+    import quiz_io
+    import user_import
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context():
+        db.create_all()
+        quiz = quiz_io.load_file(os.path.join(ROOT, 'initial', 'questions.txt'), 'Load test')
+        quiz_io.create_quiz(quiz, is_active=True)
+
+        # Same password for everyone, so it is only hashed once
+        pwhash = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+        rows = [
+            (number, {
+                'emp_id': f'E{number:06d}', 'cin': f'C{number:06d}',
+                'first_name': 'Load', 'last_name': f'Test {number}',
+                'service': f'Service {number % 7}', 'site': f'Site {number % 3}',
+                'password': pwhash,
+            })
+            for number in range(users)
+        ]
+        created, errors = user_import.insert_users(rows)
+        assert created == users, errors
+    return app
+
+
+def start(client, emp_id):
+    """Log in and load the quiz; returns what is needed to submit it."""
+    client.request('GET /login', 'GET', '/login')
+    client.request('POST /login', 'POST', '/login', {'emp_id': emp_id, 'password': PASSWORD}, expect=(302,))
+    client.request('GET /explanation', 'GET', '/explanation')
+    _, page = client.request('GET /quiz', 'GET', '/quiz')
+    page = page.decode('utf-8', 'replace')
+
+    quiz_id = SUBMIT_URL.search(page)
+    csrf_token = CSRF_TOKEN.search(page)
+    if not quiz_id or not csrf_token:
+        return None
+    options = {}
+    for question_id, option_id in OPTION.findall(page):
+        options.setdefault(question_id, []).append(option_id)
+    return quiz_id.group(1), csrf_token.group(1), options
+
+
+def submit(client, state, rng):
+    quiz_id, csrf_token, options = state
+    form = [('csrf_token', csrf_token)]
+    for question_id, option_ids in options.items():
+        form.append((f'question_{question_id}', rng.choice(option_ids)))
+    response, _ = client.request('POST /submit_quiz', 'POST', f'/submit_quiz/{quiz_id}', form, expect=(302,))
+    if response is not None and response.status == 302:
+        location = response.headers['Location']
+        client.request('GET /result', 'GET', location[location.index('/result'):])
+
+
+def run_workers(concurrency, jobs):
+    """Run the callables in jobs with concurrency threads; returns the wall time."""
+    jobs = list(jobs)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                job = jobs.pop()
+            job()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start_time
+
+
+def scrape_lock_errors(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', '/metrics')
+        response = connection.getresponse()
+        body = response.read().decode()
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+    if response.status != 200:
+        return None  # prometheus_client not installed
+    match = re.search(r'^quiz_sqlite_lock_errors_total (\S+)$', body, re.MULTILINE)
+    return int(float(match.group(1))) if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50, help='client threads')
+    parser.add_argument('--submit', choices=['burst', 'spread'], default='burst')
+    parser.add_argument('--think-time', type=float, default=2.0,
+                        help='maximum seconds between loading the quiz and submitting it, with --submit spread')
+    parser.add_argument('--db-profile', default='production')
+    parser.add_argument('--submission-mode', default='sync')
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:1000',
+                        help='password hash of the employees; the production default makes logins dominate')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app reads its configuration from the environment at import
+        os.environ.update({
+            'DATABASE_URL': 'sqlite:///' + os.path.join(tmp, 'exam.db'),
+            'DB_PROFILE': args.db_profile,
+            'SUBMISSION_MODE': args.submission_mode,
+            'PASSWORD_HASH_METHOD': args.hash_method,
+            'LOGIN_MAX_FAILURES': str(args.users * 10),
+            'JINJA_BYTECODE_CACHE_DIR': os.path.join(tmp, 'jinja_cache'),
+        })
+        app = setup(args.users)
+
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        server.log_request = lambda *a, **kw: None  # Keep the output readable
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+
+        recorder = Recorder()
+        rng = random.Random(args.seed)
+        clients = [Client(port, recorder) for _ in range(args.users)]
+        states = [None] * args.users
+
+        def start_job(number):
+            def job():
+                states[number] = start(clients[number], f'E{number:06d}')
+                if args.submit == 'spread' and states[number]:
+                    time.sleep(rng.uniform(0, args.think_time))
+                    submit(clients[number], states[number], random.Random(args.seed + number))
+            return job
+
+        def submit_job(number):
+            def job():
+                if states[number]:
+                    submit(clients[number], states[number], random.Random(args.seed + number))
+            return job
+
+        start_seconds = run_workers(args.concurrency, [start_job(n) for n in range(args.users)])
+        submit_seconds = None
+        if args.submit == 'burst':
+            # Timer expiry: every loaded quiz is submitted at the same moment
+            submit_seconds = run_workers(args.concurrency, [submit_job(n) for n in range(args.users)])
+
+        lock_errors = scrape_lock_errors(port)
+        for client in clients:
+            client.close()
+        server.shutdown()
+
+        from models import Attempt
+        with app.app_context():
+            stored = Attempt.query.count()
+
+    endpoints = {}
+    for name, samples in recorder.samples.items():
+        samples.sort()
+        endpoints[name] = {
+            'requests': len(samples),
+            'errors': sum(recorder.errors.get(name, {}).values()),
+            'p50_ms': round(percentile(samples, 50) * 1000, 2),
+            'p95_ms': round(percentile(samples, 95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            'max_ms': round(samples[-1] * 1000, 2),
+        }
+    submissions = endpoints.get('POST /submit_quiz', {}).get('requests', 0)
+    summary = {
+        'config': vars(args),
+        'start_phase_seconds': round(start_seconds, 3),
+        'submit_phase_seconds': round(submit_seconds, 3) if submit_seconds is not None else None,
+        'requests_per_second': round(sum(e['requests'] for e in endpoints.values())
+                                     / (start_seconds + (submit_seconds or 0)), 1),
+        'submissions_per_second': round(submissions / submit_seconds, 1) if submit_seconds else None,
+        'attempts_stored': stored,
+        'sqlite_lock_errors': lock_errors,
+        'endpoints': endpoints,
+        'errors': recorder.errors,
+    }
+
+    print(f"{args.users} employees, {args.concurrency} clients, {args.submit} submissions, "
+          f"DB_PROFILE={args.db_profile}, SUBMISSION_MODE={args.submission_mode}")
+    print(f"{'endpoint':<20} {'requests':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, e in endpoints.items():
+        print(f"{name:<20} {e['requests']:>8} {e['errors']:>7} {e['p50_ms']:>8} {e['p95_ms']:>8} "
+              f"{e['p99_ms']:>8} {e['max_ms']:>8}")
+    print(f"Throughput: {summary['requests_per_second']} requests/s", end='')
+    if summary['submissions_per_second'] is not None:
+        print(f", burst of {submissions} submissions in {summary['submit_phase_seconds']}s "
+              f"({summary['submissions_per_second']}/s)", end='')
+    print()
+    print(f"Attempts stored: {stored}/{args.users}, SQLite lock errors: {lock_errors if lock_errors is not None else 'n/a'}")
+    for name, errors in recorder.errors.items():
+        print(f"  {name}: {errors}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    failed = any(recorder.errors.values()) or stored != args.users
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
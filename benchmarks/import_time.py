@@ -0,0 +1,148 @@
+"""Track the cold-start cost of importing the application.
+
+Imports `app` in fresh interpreters under `python -X importtime`, and
+reports the total import time, the slowest top-level imports and the peak
+RSS. Heavy analytics dependencies must stay out of worker startup: the run
+fails if any module in DEFERRED_MODULES was imported.
+
+    python benchmarks/import_time.py [--runs 5] [--json out.json]
+                                     [--baseline previous.json] [--tolerance 0.2]
+
+With --baseline, the run also fails when the median import time or RSS
+grew by more than --tolerance (a fraction) compared to the baseline file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by the export and dashboard routes; loaded on first use
+DEFERRED_MODULES = ('pandas', 'matplotlib', 'xlsxwriter', 'numpy')
+
+CHILD = f"""
+import resource, sys
+import app
+heavy = sorted(name for name in {DEFERRED_MODULES!r} if name in sys.modules)
+print('RESULT', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ','.join(heavy))
+"""
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} for the modules imported directly by the child."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # Header line
+        name = fields[2].rstrip()
+        if len(name) - len(name.lstrip()) == 1:  # Nested imports are indented further
+            cumulative[name.strip()] = int(fields[1])
+    return cumulative
+
+
+def parse_children(stderr, parent):
+    """Return {module: cumulative microseconds} for the modules imported directly by parent.
+
+    -X importtime prints a module after everything it imported, one
+    indentation level (two spaces) deeper than its parent.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(fields[1])))
+
+    children = {}
+    for index, (level, name, _) in enumerate(entries):
+        if name != parent:
+            continue
+        # Walk back over the entries printed before the parent at deeper levels
+        for child_level, child_name, child_us in reversed(entries[:index]):
+            if child_level <= level:
+                break
+            if child_level == level + 2:
+                children[child_name] = child_us
+    return children
+
+
+def run_once():
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f'Importing app failed with status {completed.returncode}')
+
+    result = next(line for line in completed.stdout.splitlines() if line.startswith('RESULT'))
+    _, rss, heavy = (result.split(' ') + [''])[:3]
+    modules = parse_importtime(completed.stderr)
+    children = parse_children(completed.stderr, 'app')
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss_mb = int(rss) / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return {
+        'import_ms': modules['app'] / 1000,
+        'rss_mb': rss_mb,
+        'children': children,
+        'heavy_modules': [name for name in heavy.split(',') if name],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results file of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {
+        'import_ms': statistics.median(run['import_ms'] for run in runs),
+        'rss_mb': statistics.median(run['rss_mb'] for run in runs),
+        'heavy_modules': sorted(set(name for run in runs for name in run['heavy_modules'])),
+        'slowest_imports': sorted(
+            ((name, statistics.median(run['children'].get(name, 0) for run in runs) / 1000)
+             for name in runs[0]['children']),
+            key=lambda item: item[1], reverse=True
+        )[:args.top],
+    }
+
+    print(f"import app: {summary['import_ms']:.1f} ms (median of {args.runs}), peak RSS {summary['rss_mb']:.1f} MB")
+    for name, ms in summary['slowest_imports']:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failures = []
+    if summary['heavy_modules']:
+        failures.append(f"deferred modules imported at startup: {', '.join(summary['heavy_modules'])}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('import_ms', 'rss_mb'):
+            limit = baseline[key] * (1 + args.tolerance)
+            if summary[key] > limit:
+                failures.append(f"{key} regressed: {summary[key]:.1f} > {limit:.1f} (baseline {baseline[key]:.1f})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
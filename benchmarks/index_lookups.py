@@ -0,0 +1,176 @@
+"""Time the hot-path lookups before and after migrations.upgrade() adds the indexes.
+
+Builds a throwaway SQLite database with the schema from models.py but no
+secondary indexes, fills it with USERS users and ANSWERS answers, times
+each lookup, runs the in-place migration and times them again.
+
+    python benchmarks/index_lookups.py [--users 100000] [--answers 1000000]
+"""
+import argparse
+from datetime import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import db  # noqa: E402
+import migrations  # noqa: E402
+
+QUIZZES = 50
+QUESTIONS_PER_QUIZ = 17
+OPTIONS_PER_QUESTION = 4
+ANSWERS_PER_ATTEMPT = 34
+LOOKUPS = 2000
+CHUNK = 50000
+
+LOOKUP_QUERIES = {
+    'login (emp_id)': ('SELECT * FROM "Users" WHERE emp_id = :emp_id', 'emp_id'),
+    'register (emp_id or cin)': ('SELECT * FROM "Users" WHERE emp_id = :emp_id OR cin = :cin', 'emp_id_cin'),
+    'attempt (user_id, quiz_id)': ('SELECT * FROM "Attempts" WHERE user_id = :user_id AND quiz_id = :quiz_id', 'attempt'),
+    'answers of attempt': ('SELECT * FROM "Answers" WHERE attempt_id = :attempt_id', 'attempt_id'),
+    'question translation': ('SELECT title FROM "QuestionTrans" WHERE question_id = :question_id AND language = :language', 'question'),
+    'option translation': ('SELECT text FROM "OptionTrans" WHERE option_id = :option_id AND language = :language', 'option'),
+    'active quiz': ('SELECT * FROM "Quizzes" WHERE is_active = 1', None),
+}
+
+
+def insert_chunked(connection, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            connection.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(table.insert(), chunk)
+
+
+def populate(connection, users, answers):
+    tables = db.metadata.tables
+    insert_chunked(connection, tables['Users'], (
+        {'id': i, 'emp_id': f'E{i:07d}', 'cin': f'C{i:07d}', 'first_name': 'First', 'last_name': 'Last',
+         'service': f'Service {i % 12}', 'site': f'Site {i % 5}', 'password': 'x'}
+        for i in range(1, users + 1)
+    ))
+    insert_chunked(connection, tables['Quizzes'], (
+        {'id': i, 'title': f'Quiz {i}', 'language': 'en', 'is_active': i == QUIZZES}
+        for i in range(1, QUIZZES + 1)
+    ))
+    question_count = QUIZZES * QUESTIONS_PER_QUIZ
+    insert_chunked(connection, tables['Questions'], (
+        {'id': i, 'quiz_id': (i - 1) // QUESTIONS_PER_QUIZ + 1, 'title': f'Question {i}'}
+        for i in range(1, question_count + 1)
+    ))
+    insert_chunked(connection, tables['QuestionTrans'], (
+        {'question_id': i, 'language': language, 'title': f'Question {i} ({language})'}
+        for i in range(1, question_count + 1) for language in ('fr', 'ar')
+    ))
+    option_count = question_count * OPTIONS_PER_QUESTION
+    insert_chunked(connection, tables['Options'], (
+        {'id': i, 'question_id': (i - 1) // OPTIONS_PER_QUESTION + 1, 'text': f'Option {i}', 'is_correct': i % 2 == 0}
+        for i in range(1, option_count + 1)
+    ))
+    insert_chunked(connection, tables['OptionTrans'], (
+        {'option_id': i, 'language': language, 'text': f'Option {i} ({language})'}
+        for i in range(1, option_count + 1) for language in ('fr', 'ar')
+    ))
+
+    attempts = max(1, answers // ANSWERS_PER_ATTEMPT)
+    rng = random.Random(42)
+    attempt_rows = []
+    seen = set()
+    while len(attempt_rows) < attempts:
+        user_id, quiz_id = rng.randint(1, users), rng.randint(1, QUIZZES)
+        if (user_id, quiz_id) in seen:
+            continue
+        seen.add((user_id, quiz_id))
+        attempt_rows.append({'id': len(attempt_rows) + 1, 'user_id': user_id, 'quiz_id': quiz_id,
+                             'score': rng.randint(-10, 68), 'status': 'Passed', 'time': datetime(2024, 7, 1, 8)})
+    insert_chunked(connection, tables['Attempts'], attempt_rows)
+
+    def answer_rows():
+        for index in range(answers):
+            attempt = attempt_rows[index // ANSWERS_PER_ATTEMPT % attempts]
+            question_id = (attempt['quiz_id'] - 1) * QUESTIONS_PER_QUIZ + index % QUESTIONS_PER_QUIZ + 1
+            option_id = (question_id - 1) * OPTIONS_PER_QUESTION + rng.randint(1, OPTIONS_PER_QUESTION)
+            yield {'attempt_id': attempt['id'], 'question_id': question_id,
+                   'option_id': option_id, 'is_correct': option_id % 2 == 0}
+    insert_chunked(connection, tables['Answers'], answer_rows())
+    return attempt_rows, question_count, option_count
+
+
+def parameters(kind, rng, users, attempt_rows, question_count, option_count):
+    if kind == 'emp_id':
+        return {'emp_id': f'E{rng.randint(1, users):07d}'}
+    if kind == 'emp_id_cin':
+        user_id = rng.randint(1, users)
+        return {'emp_id': f'E{user_id:07d}', 'cin': f'C{user_id:07d}'}
+    if kind == 'attempt':
+        attempt = rng.choice(attempt_rows)
+        return {'user_id': attempt['user_id'], 'quiz_id': attempt['quiz_id']}
+    if kind == 'attempt_id':
+        return {'attempt_id': rng.randint(1, len(attempt_rows))}
+    if kind == 'question':
+        return {'question_id': rng.randint(1, question_count), 'language': 'fr'}
+    if kind == 'option':
+        return {'option_id': rng.randint(1, option_count), 'language': 'ar'}
+    return {}
+
+
+def time_lookups(connection, users, attempt_rows, question_count, option_count):
+    timings = {}
+    for name, (sql, kind) in LOOKUP_QUERIES.items():
+        rng = random.Random(7)
+        statement = text(sql)
+        params = [parameters(kind, rng, users, attempt_rows, question_count, option_count) for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for values in params:
+            connection.execute(statement, values).fetchall()
+        timings[name] = (time.perf_counter() - start) / LOOKUPS * 1e6
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--answers', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        with engine.begin() as connection:
+            db.metadata.create_all(connection)
+            # Start from the pre-migration schema: primary keys only
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.drop(connection)
+
+            start = time.perf_counter()
+            data = populate(connection, args.users, args.answers)
+            print(f"Populated {args.users} users, {len(data[0])} attempts, {args.answers} answers "
+                  f"in {time.perf_counter() - start:.1f} s")
+
+        with engine.connect() as connection:
+            before = time_lookups(connection, args.users, *data)
+
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            report = migrations.upgrade(connection)
+        print(f"Migration created {sum(1 for _, action, _ in report if action == 'created')} indexes "
+              f"in {time.perf_counter() - start:.1f} s")
+
+        with engine.connect() as connection:
+            after = time_lookups(connection, args.users, *data)
+        engine.dispose()
+
+    print(f"\n{'lookup':<28} {'before (us)':>12} {'after (us)':>12} {'speedup':>9}")
+    for name in LOOKUP_QUERIES:
+        print(f"{name:<28} {before[name]:12.1f} {after[name]:12.1f} {before[name] / after[name]:8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Measure password verification throughput against the number of hashing workers.
+
+Simulates a shift logging in: CLIENTS request threads each verify
+passwords through hashing.HashingService as fast as they can, for every
+worker count given. Workers=0 hashes on the request threads themselves,
+which is how logins worked before the process pool.
+
+    python benchmarks/login_throughput.py [--workers 0 1 2 4 8] [--clients 32] [--logins 200]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from werkzeug.security import generate_password_hash  # noqa: E402
+import hashing  # noqa: E402
+
+
+def measure(workers, clients, logins, pwhash):
+    service = hashing.HashingService(method=pwhash.split('$', 1)[0], workers=workers,
+                                     max_pending=clients, queue_timeout=60)
+    service.check(pwhash, 'password')  # Start the pool outside the measurement
+
+    remaining = [logins]
+    lock = threading.Lock()
+    latencies = []
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            assert service.check(pwhash, 'password')
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    service.shutdown()
+
+    latencies.sort()
+    return logins / duration, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--clients', type=int, default=32, help='concurrent request threads')
+    parser.add_argument('--logins', type=int, default=200, help='logins per measurement')
+    parser.add_argument('--method', default='scrypt', help="hash method (default: Werkzeug's, as in production)")
+    args = parser.parse_args()
+
+    pwhash = generate_password_hash('password', args.method)
+    print(f"{args.logins} logins from {args.clients} concurrent clients, {args.method}")
+    print(f"{'workers':>8} {'logins/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for workers in args.workers:
+        throughput, p50, p95 = measure(workers, args.clients, args.logins, pwhash)
+        print(f"{workers:>8} {throughput:10.1f} {p50 * 1000:10.0f} {p95 * 1000:10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Check that readers are not blocked by a writer under a database profile.
+
+A writer thread takes an exclusive write transaction and holds it for
+WRITE_HOLD seconds while the main thread runs a read query. With SQLite's
+stock rollback journal the read waits for the writer (or fails with
+"database is locked"); with the WAL-based 'production' profile it returns
+immediately.
+
+    python benchmarks/sqlite_concurrency.py [profile ...]
+
+Exits with status 1 if a reader was blocked under the 'production' profile.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import PROFILES, apply_pragmas  # noqa: E402
+
+WRITE_HOLD = 1.0  # Seconds the writer keeps its transaction open
+BLOCKED_THRESHOLD = 0.1  # A read slower than this counts as blocked
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def run(profile_name):
+    pragmas = PROFILES[profile_name]['pragmas']
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'concurrency.db')
+
+        setup = connect(path, pragmas)
+        setup.execute('CREATE TABLE Attempts (id INTEGER PRIMARY KEY, score INTEGER NOT NULL)')
+        setup.executemany('INSERT INTO Attempts (score) VALUES (?)', [(i % 68,) for i in range(10000)])
+        setup.close()
+
+        writer_ready = threading.Event()
+
+        def writer():
+            connection = connect(path, pragmas)
+            connection.execute('BEGIN EXCLUSIVE')
+            connection.execute('INSERT INTO Attempts (score) VALUES (68)')
+            writer_ready.set()
+            time.sleep(WRITE_HOLD)
+            connection.execute('COMMIT')
+            connection.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        writer_ready.wait()
+
+        reader = connect(path, pragmas)
+        start = time.perf_counter()
+        try:
+            reader.execute('SELECT COUNT(*), AVG(score) FROM Attempts').fetchone()
+            outcome = 'ok'
+        except sqlite3.OperationalError as e:
+            outcome = str(e)
+        elapsed = time.perf_counter() - start
+        reader.close()
+        thread.join()
+
+    return outcome, elapsed
+
+
+def main(profiles):
+    failed = False
+    for profile_name in profiles:
+        outcome, elapsed = run(profile_name)
+        blocked = outcome != 'ok' or elapsed > BLOCKED_THRESHOLD
+        print(f"{profile_name:<12} read during write: {outcome:<20} {elapsed * 1000:8.1f} ms"
+              f"  {'BLOCKED' if blocked else 'not blocked'}")
+        if profile_name == 'production' and blocked:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:] or ['default', 'production']))
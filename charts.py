@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import io
+import json
+
+# Rendered PNGs keyed by chart name and a hash of the data drawn in them.
+# Charts only change when the metrics do, so most dashboard views are hits.
+MAX_CACHED_CHARTS = 32
+
+_cache = OrderedDict()
+_lock = Lock()
+
+
+def data_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def chart_data(name, metrics):
+    """The part of the dashboard metrics a chart is drawn from."""
+    if name == 'attempts_per_quiz':
+        return metrics['attempts_per_quiz']
+    if name == 'score_distribution':
+        return metrics['score_distribution']
+    raise KeyError(name)
+
+
+def get_chart(name, data):
+    """Return (etag, png bytes) for a chart, rendering it only on a cache miss."""
+    key = (name, data_hash(data))
+    with _lock:
+        png = _cache.get(key)
+        if png is not None:
+            _cache.move_to_end(key)
+            return key[1], png
+
+    png = RENDERERS[name](data)
+    with _lock:
+        _cache[key] = png
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_CHARTS:
+            _cache.popitem(last=False)
+    return key[1], png
+
+
+def _to_png(fig):
+    # Figure objects are independent of pyplot's global state, so rendering
+    # is safe from several request threads at once
+    img = io.BytesIO()
+    fig.savefig(img, format='png')
+    return img.getvalue()
+
+
+def render_attempts_per_quiz(attempts_per_quiz):
+    from matplotlib.figure import Figure  # Deferred: only the dashboard needs matplotlib
+
+    fig = Figure()
+    ax = fig.subplots()
+    quizzes = [item["title"] for item in attempts_per_quiz]
+    attempts = [item["attempt_count"] for item in attempts_per_quiz]
+
+    # Create the bar chart
+    ax.bar(quizzes, attempts, color='teal')
+    ax.set_xlabel('Quizzes')
+    ax.set_ylabel('Number of Attempts')
+    ax.set_title('Attempts per Quiz')
+
+    # Rotate x-axis labels to vertical
+    ax.set_xticks(range(len(quizzes)))
+    ax.set_xticklabels(quizzes, rotation=90, ha='center')
+
+    # Improve layout
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def render_score_distribution(score_distribution):
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    categories = ['Average Score', 'Minimum Score', 'Maximum Score']
+
+    # Ensure all values are non-negative; replace negative or missing values with zero
+    scores = [
+        max(score_distribution["avg_score"] or 0, 0),
+        max(score_distribution["min_score"] or 0, 0),
+        max(score_distribution["max_score"] or 0, 0)
+    ]
+
+    # Check if all scores are zero, which would lead to an invalid pie chart
+    if all(score == 0 for score in scores):
+        scores = [1, 1, 1]  # Fallback values to ensure at least some data in the pie chart
+
+    ax.pie(scores, labels=categories, autopct='%1.1f%%', colors=['purple', 'orange', 'red'])
+    ax.set_title('Score Distribution')
+    return _to_png(fig)
+
+
+RENDERERS = {
+    'attempts_per_quiz': render_attempts_per_quiz,
+    'score_distribution': render_score_distribution,
+}
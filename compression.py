@@ -0,0 +1,86 @@
+import gzip
+
+from flask import current_app, request
+
+# Response compression and conditional GET for the pages and JSON the app
+# renders itself. Files are left alone: /assets are precompressed and sent
+# as direct passthrough, and the CSV/XLSX exports are streamed.
+
+COMPRESS_MIMETYPES = ('text/html', 'application/json', 'text/css', 'text/plain', 'text/csv',
+                      'application/javascript', 'image/svg+xml')
+
+# Only these get an ETag; the body is hashed, so it is always exact
+CONDITIONAL_MIMETYPES = ('text/html', 'application/json')
+
+# Brotli's scale is 0-11; 5 compresses better than gzip -6 at a similar speed
+BROTLI_QUALITY = 5
+
+
+def _accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def _compressible(response, min_size):
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return False
+    if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES:
+        return False
+    return response.content_length is None or response.content_length >= min_size
+
+
+def _add_etag(response, encoding):
+    """Let the browser revalidate instead of downloading an unchanged page again."""
+    cache_control = response.headers.get('Cache-Control', '')
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed
+            or 'no-store' in cache_control  # auth.quiz, auth.submit_quiz: never reuse
+            or 'ETag' in response.headers or response.mimetype not in CONDITIONAL_MIMETYPES):
+        return response
+
+    response.add_etag()
+    if encoding:
+        # A compressed body is another representation: it needs its own tag
+        etag, weak = response.get_etag()
+        response.set_etag(f'{etag}-{encoding}', weak)
+    if not cache_control:
+        # Admin pages are per user: keep them out of shared caches, and have
+        # the browser ask every time (a 304 when nothing changed)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None  # gzip only
+
+    @app.after_request
+    def compress_response(response):
+        config = current_app.config
+        min_size = config.get('COMPRESS_MIN_SIZE', 500)
+        encoding = None
+        if config.get('COMPRESS_ENABLED', True) and _compressible(response, min_size):
+            response.vary.add('Accept-Encoding')
+            if brotli is not None and _accepts('br'):
+                encoding = 'br'
+            elif _accepts('gzip'):
+                encoding = 'gzip'
+            if len(response.get_data()) < min_size:
+                encoding = None
+
+        if config.get('CONDITIONAL_GET_ENABLED', True):
+            response = _add_etag(response, encoding)
+            if response.status_code != 200:
+                return response  # 304: no body left to compress
+
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(data, compresslevel=config.get('COMPRESS_LEVEL', 6))
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,94 @@
+import os
+
+# Application settings, loaded by app.py with app.config.from_object('config').
+# Every value can be overridden from the environment, or by pointing
+# APP_SETTINGS at a Python file with the same names.
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key')
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+
+# Database profile applied by database.py: 'default' keeps SQLite's stock
+# settings, 'production' enables WAL, a busy timeout and a connection pool.
+DB_PROFILE = os.environ.get('DB_PROFILE', 'default')
+
+# 'sync' writes each submission on its request thread, 'group_commit' hands
+# it to a background writer that commits many submissions together
+SUBMISSION_MODE = os.environ.get('SUBMISSION_MODE', 'sync')
+
+# How the answers of new attempts are stored: 'rows' (one Answers row per
+# selected option) or 'packed' (one bitmask row per attempt, see
+# answer_store). Both are always readable; 'flask pack-answers' converts.
+# 'packed' makes the answers ~16x smaller but does not make submitting faster.
+ANSWER_STORAGE = os.environ.get('ANSWER_STORAGE', 'rows')
+
+# Seconds a compiled quiz snapshot is reused before being rebuilt
+QUIZ_CACHE_TTL = int(os.environ.get('QUIZ_CACHE_TTL', 60))
+
+# Directory for compiled Jinja templates, shared by all workers so new ones
+# don't compile every template again; defaults to instance/jinja_cache and
+# an empty value disables it
+JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+
+# Loaded users and admins kept in memory by the Flask-Login user_loader;
+# IDENTITY_CACHE_SIZE=0 disables the cache
+IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 1000))
+IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 300))
+
+# Password hashing: unset, PASSWORD_HASH_METHOD is Werkzeug's default
+# (scrypt), which existing passwords already use, and nothing is rehashed.
+# Set to another method (e.g. pbkdf2:sha256:600000), new hashes use it and
+# older ones are replaced at each user's next successful login, at the cost
+# of a second hash on that login.
+# Hashes run in a pool of HASH_WORKERS processes (default: one per CPU,
+# 0 hashes on the request thread) with at most HASH_MAX_PENDING waiting.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD')
+HASH_WORKERS = int(os.environ['HASH_WORKERS']) if 'HASH_WORKERS' in os.environ else None
+HASH_MAX_PENDING = int(os.environ['HASH_MAX_PENDING']) if 'HASH_MAX_PENDING' in os.environ else None
+HASH_QUEUE_TIMEOUT = float(os.environ.get('HASH_QUEUE_TIMEOUT', 5))
+
+# A client is refused after LOGIN_MAX_FAILURES failed logins within
+# LOGIN_FAILURE_WINDOW seconds
+LOGIN_MAX_FAILURES = int(os.environ.get('LOGIN_MAX_FAILURES', 5))
+LOGIN_FAILURE_WINDOW = int(os.environ.get('LOGIN_FAILURE_WINDOW', 300))
+
+# Hash method for the initial passwords of bulk imported users; unset, it is
+# the one of PASSWORD_HASH_METHOD. A cheaper method (e.g. pbkdf2:sha256:1000) imports
+# tens of thousands of rows in seconds, but is an explicit opt-in: those
+# hashes are only upgraded at each user's first login, which may never
+# come, and the import report warns about it.
+BULK_IMPORT_HASH_METHOD = os.environ.get('BULK_IMPORT_HASH_METHOD')
+
+# Request profiler (admin Profiler page): wall, SQL and template time per
+# endpoint, keeping the last PROFILER_SAMPLES requests of each. A request
+# running the same statement PROFILER_REPEAT_THRESHOLD times or more is
+# reported as a probable N+1 query. Off by default; when off nothing is hooked.
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '0') == '1'
+PROFILER_SAMPLES = int(os.environ.get('PROFILER_SAMPLES', 500))
+PROFILER_REPEAT_THRESHOLD = int(os.environ.get('PROFILER_REPEAT_THRESHOLD', 10))
+
+# Prometheus metrics at /metrics (needs prometheus_client). With several
+# worker processes, point METRICS_MULTIPROC_DIR at a directory shared by
+# them and emptied at server start, so /metrics aggregates every worker.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# Static assets are minified, fingerprinted and precompressed into
+# ASSETS_DIR (default static/dist) and served from /assets with immutable
+# cache headers. They are rebuilt at startup whenever static/ has changed;
+# with ASSETS_BUILD_ON_STARTUP=0 run 'flask build-assets' at deploy time.
+ASSETS_DIR = os.environ.get('ASSETS_DIR')
+ASSETS_BUILD_ON_STARTUP = os.environ.get('ASSETS_BUILD_ON_STARTUP', '1') == '1'
+
+# gzip (or brotli, when installed) for rendered HTML/JSON of at least
+# COMPRESS_MIN_SIZE bytes, and ETags so unchanged pages are answered with
+# 304. Pages sent with Cache-Control: no-store never get an ETag.
+COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+CONDITIONAL_GET_ENABLED = os.environ.get('CONDITIONAL_GET_ENABLED', '1') == '1'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+
+# Autosaved quiz answers arriving within AUTOSAVE_MAX_DELAY seconds of each
+# other (or AUTOSAVE_MAX_BATCH participants' worth) are written in a single
+# transaction; each autosave request returns once its batch is committed
+AUTOSAVE_MAX_DELAY = float(os.environ.get('AUTOSAVE_MAX_DELAY', 0.05))
+AUTOSAVE_MAX_BATCH = int(os.environ.get('AUTOSAVE_MAX_BATCH', 500))
@@ -0,0 +1,75 @@
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from models import db
+
+# Named database profiles. 'pragmas' are run on every new SQLite connection,
+# 'engine_options' are passed to SQLAlchemy's create_engine.
+PROFILES = {
+    'default': {
+        'pragmas': {},
+        'engine_options': {},
+    },
+    'production': {
+        'pragmas': {
+            # Readers no longer block behind a writer, and commits only append to the WAL
+            'journal_mode': 'WAL',
+            # Safe with WAL: a power loss can only lose the last commits, never corrupt
+            'synchronous': 'NORMAL',
+            # Wait for the write lock instead of failing with "database is locked"
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64000,  # Negative means KiB, so 64 MB per connection
+            'temp_store': 'MEMORY',
+        },
+        'engine_options': {
+            # Keep connections (and their page cache) alive between requests
+            'poolclass': QueuePool,
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_timeout': 30,
+            'pool_pre_ping': True,
+            'connect_args': {
+                'timeout': 5,  # Seconds, Python's own busy handler
+                'check_same_thread': False,
+            },
+        },
+    },
+}
+
+
+def get_profile(app):
+    name = app.config.get('DB_PROFILE', 'default')
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}', expected one of {sorted(PROFILES)}")
+    profile = PROFILES[name]
+
+    # SQLITE_PRAGMAS and SQLALCHEMY_ENGINE_OPTIONS in the config refine the profile
+    pragmas = dict(profile['pragmas'])
+    pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+    engine_options = dict(profile['engine_options'])
+    engine_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    return pragmas, engine_options
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def init_app(app):
+    """Initialize db with the configured database profile."""
+    pragmas, engine_options = get_profile(app)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    db.init_app(app)
+
+    if not pragmas or not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            apply_pragmas(dbapi_connection, pragmas)
@@ -0,0 +1,239 @@
+from datetime import datetime, timedelta
+import random
+import time
+
+import click
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+from models import db, User, Quiz, Attempt, Answer
+import answer_store
+import quiz_cache
+import quiz_io
+import scoring
+import stats
+
+# Synthetic data for benchmarking at production scale: employees spread
+# over sites and services, translated quizzes, and attempts whose answers
+# follow each employee's ability and each question's difficulty. The same
+# seed always produces the same database.
+
+SITES = ('Agadir', 'Casablanca', 'Kenitra', 'Berkane', 'Dakhla', 'Larache', 'Tanger', 'Meknes')
+SERVICES = ('Production', 'Conditionnement', 'Recolte', 'Qualite', 'Logistique', 'Maintenance',
+            'Irrigation', 'Ressources humaines', 'Administration', 'Securite')
+
+# Password of every generated employee; hashed once and shared
+PASSWORD = 'password'
+
+# Attempts (with their answers) written per transaction
+CHUNK_SIZE = 10000
+
+OPTIONS_PER_QUESTION = 4
+
+# Attempts are dated in the days before this one, not before today, so a
+# seed gives the same times (and dashboard buckets) whenever it is run
+UNTIL = datetime(2025, 1, 1)
+
+
+def _names(base, count, prefix):
+    return [base[i] if i < len(base) else f'{prefix} {i + 1}' for i in range(count)]
+
+
+def _skewed_weights(count):
+    # A few large sites and services, many small ones
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def synthetic_quiz(rng, number, questions):
+    """A quiz dict (see quiz_io) with fr/ar translations; a quarter of the questions have two answers."""
+    quiz = {'title': f'Formation securite {number + 1}', 'language': 'en', 'questions': []}
+    for q in range(questions):
+        correct = set(rng.sample(range(OPTIONS_PER_QUESTION), 2 if rng.random() < 0.25 else 1))
+        quiz['questions'].append({
+            'title': f'Quiz {number + 1}, question {q + 1}',
+            'translations': {'fr': f'Quiz {number + 1}, question {q + 1} (fr)',
+                             'ar': f'Quiz {number + 1}, question {q + 1} (ar)'},
+            'options': [
+                {
+                    'text': f'Option {o + 1}',
+                    'is_correct': o in correct,
+                    'translations': {'fr': f'Choix {o + 1}', 'ar': f'Option {o + 1} (ar)'},
+                }
+                for o in range(OPTIONS_PER_QUESTION)
+            ],
+        })
+    return quiz
+
+
+def pick_options(rng, options, correct, p_correct):
+    """Options an employee checks for one question."""
+    if rng.random() < p_correct:
+        return list(correct)
+    wrong = list(options - correct)
+    if len(correct) > 1 and rng.random() < 0.5:
+        return [rng.choice(sorted(correct))]  # Found only one of the answers
+    if rng.random() < 0.2:
+        return [rng.choice(sorted(correct)), rng.choice(wrong)]  # Hedged
+    return [rng.choice(wrong)]
+
+
+def _next_id(connection, column):
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def generate_users(connection, rng, count, sites, services):
+    """Insert count users in the caller's transaction; returns their ids."""
+    pwhash = generate_password_hash(PASSWORD, 'pbkdf2:sha256:1000')
+    site_weights = _skewed_weights(len(sites))
+    service_weights = _skewed_weights(len(services))
+    first_id = _next_id(connection, User.id)
+
+    users = []
+    for start in range(0, count, CHUNK_SIZE * 5):
+        rows = []
+        for n in range(start, min(count, start + CHUNK_SIZE * 5)):
+            user_id = first_id + n
+            site = rng.choices(sites, site_weights)[0]
+            service = rng.choices(services, service_weights)[0]
+            rows.append((user_id, f'EMP{user_id:07d}', f'CIN{user_id:07d}', f'Prenom{n}', f'Nom{n}',
+                         service, site, pwhash))
+            users.append(user_id)
+        connection.exec_driver_sql(
+            'INSERT INTO Users (id, emp_id, cin, first_name, last_name, service, site, password) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    return users
+
+
+def generate_attempts(engine, rng, users, answer_keys, count, days, progress=None, packed=False, until=UNTIL):
+    """Insert count attempts, each user taking each quiz at most once; returns the number of answers.
+
+    Attempts fall on the given number of days before until. With packed
+    the answers are stored as PackedAnswers (see answer_store).
+    """
+    if count > len(users) * len(answer_keys):
+        raise ValueError(f'{count} attempts is more than one per user and quiz '
+                         f'({len(users)} users x {len(answer_keys)} quizzes)')
+
+    # Ability per employee, difficulty per question
+    ability = {user_id: rng.betavariate(8, 2) for user_id in users}
+    easiness = {question_id: rng.betavariate(5, 2) - 0.7
+                for key in answer_keys for question_id in key.options}
+
+    # Spread the attempts evenly over the users, each on distinct quizzes
+    per_user, extra = divmod(count, len(users))
+    pairs = []
+    for index, user_id in enumerate(users):
+        taken = per_user + (1 if index < extra else 0)
+        pairs.extend((user_id, key) for key in rng.sample(answer_keys, taken))
+    rng.shuffle(pairs)
+
+    until = datetime.combine(until, datetime.min.time())
+    with engine.begin() as connection:
+        attempt_id = _next_id(connection, Attempt.id)
+    answer_count = 0
+    for start in range(0, len(pairs), CHUNK_SIZE):
+        attempts = []
+        answers = []
+        for user_id, key in pairs[start:start + CHUNK_SIZE]:
+            selections = {
+                question_id: pick_options(rng, options, key.correct[question_id],
+                                          min(0.99, max(0.05, ability[user_id] + easiness[question_id])))
+                for question_id, options in key.options.items()
+            }
+            result = scoring.score_submission(key, selections)
+            # A past working day, between 07:00 and 17:00
+            when = until - timedelta(days=rng.randint(1, days)) + timedelta(hours=7, minutes=rng.randrange(600))
+            attempts.append((attempt_id, user_id, key.quiz_id, result.score, result.status, when.isoformat(' ')))
+            answers.append((attempt_id, key, result.answers))
+            attempt_id += 1
+
+        # One transaction per chunk keeps the journal small
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                'INSERT INTO Attempts (id, user_id, quiz_id, score, status, time) VALUES (?, ?, ?, ?, ?, ?)', attempts)
+            if packed:
+                layouts = {key.quiz_id: answer_store.layout_for(connection, key) for key in answer_keys}
+                connection.exec_driver_sql(
+                    'INSERT INTO PackedAnswers (attempt_id, layout_id, masks) VALUES (?, ?, ?)',
+                    [(attempt, layouts[key.quiz_id].id, answer_store.encode(layouts[key.quiz_id], selected))
+                     for attempt, key, selected in answers if selected])
+            else:
+                connection.exec_driver_sql(
+                    'INSERT INTO Answers (attempt_id, question_id, option_id, is_correct) VALUES (?, ?, ?, ?)',
+                    [(attempt, question_id, option_id, is_correct)
+                     for attempt, key, selected in answers for question_id, option_id, is_correct in selected])
+        answer_count += sum(len(selected) for _, _, selected in answers)
+        if progress:
+            progress(start + len(attempts), len(pairs))
+    return answer_count
+
+
+def generate(users, quizzes, questions, attempts, sites, services, days, seed, progress=None, packed=False,
+             until=UNTIL):
+    """Fill the configured database; returns (users, quizzes, attempts, answers) created."""
+    rng = random.Random(seed)
+
+    # Quizzes go through the regular import path, one transaction each
+    quiz_ids = [quiz_io.create_quiz(synthetic_quiz(rng, n, questions), is_active=(n == quizzes - 1))
+                for n in range(quizzes)]
+    answer_keys = [quiz_cache.load_answer_key(quiz_id) for quiz_id in quiz_ids]
+    db.session.remove()
+
+    with db.engine.begin() as connection:
+        user_ids = generate_users(connection, rng, users, sites, services)
+
+    # The answers index is built once at the end rather than updated row by row
+    answers_index = next(index for index in Answer.__table__.indexes if index.name == 'ix_answers_attempt_id')
+    with db.engine.begin() as connection:
+        answers_index.drop(connection, checkfirst=True)
+    try:
+        answer_count = generate_attempts(db.engine, rng, user_ids, answer_keys, attempts, days, progress, packed,
+                                         until)
+    finally:
+        with db.engine.begin() as connection:
+            answers_index.create(connection, checkfirst=True)
+
+    with db.engine.begin() as connection:
+        stats.rebuild(connection)
+
+    return len(user_ids), len(quiz_ids), attempts, answer_count
+
+
+def init_app(app):
+    @app.cli.command('generate-data')
+    @click.option('--users', type=int, default=100000)
+    @click.option('--quizzes', type=int, default=50)
+    @click.option('--questions', type=int, default=10, help='Questions per quiz.')
+    @click.option('--attempts', type=int, default=1000000)
+    @click.option('--sites', type=int, default=len(SITES))
+    @click.option('--services', type=int, default=len(SERVICES))
+    @click.option('--days', type=int, default=365, help='Attempts are spread over this many days before --until.')
+    @click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), default=UNTIL.strftime('%Y-%m-%d'),
+                  help='Day after the last attempt (YYYY-MM-DD); fixed so a seed always gives the same data.')
+    @click.option('--seed', type=int, default=42)
+    def generate_data_command(users, quizzes, questions, attempts, sites, services, days, until, seed):
+        """Fill the configured database with synthetic users, quizzes, attempts and answers.
+
+        Meant for an empty benchmark database, e.g.
+        DATABASE_URL=sqlite:////tmp/bench.db flask generate-data
+        """
+        db.create_all()
+        if db.session.query(User.id).first() is not None or db.session.query(Quiz.id).first() is not None:
+            raise click.ClickException('The database already has users or quizzes; use an empty database.')
+        if attempts and not (users and quizzes):
+            raise click.ClickException('Attempts need at least one user and one quiz.')
+
+        started = time.perf_counter()
+
+        def progress(done, total):
+            if done % 100000 and done != total:
+                return
+            click.echo(f'  {done}/{total} attempts ({time.perf_counter() - started:.0f}s)')
+
+        try:
+            created = generate(users, quizzes, questions, attempts, _names(SITES, sites, 'Site'),
+                               _names(SERVICES, services, 'Service'), days, seed, progress,
+                               packed=app.config.get('ANSWER_STORAGE', 'rows') == 'packed', until=until)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo('{} users, {} quizzes, {} attempts and {} answers created in {:.0f}s.'.format(
+            *created, time.perf_counter() - started))
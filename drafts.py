@@ -0,0 +1,168 @@
+from concurrent.futures import Future
+from datetime import datetime
+import atexit
+import json
+import threading
+
+from flask import current_app
+from sqlalchemy import func, select, delete, exists, and_, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Attempt, AnswerDraft
+
+answer_drafts = AnswerDraft.__table__
+attempts = Attempt.__table__
+
+
+class DraftBuffer:
+    """Coalesces autosaved answers and writes them in batches.
+
+    Each autosave is a delta {question_id: [option_ids]} replacing the
+    selection of those questions. Deltas are merged per participant and a
+    background thread writes every changed draft in one transaction, at
+    most max_delay seconds after the first one arrived or as soon as
+    max_batch drafts are waiting. However many times hundreds of
+    participants click, the database sees one transaction per batch.
+
+    save() returns once its delta is committed, so no worker process ever
+    holds a draft another one cannot read. Rows are merged with SQLite's
+    json_patch, so drafts written by several workers combine question by
+    question, and a draft is never written once its attempt exists.
+    """
+
+    def __init__(self, app, max_delay=0.05, max_batch=500):
+        self.app = app
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._pending = {}  # (user_id, quiz_id) -> {question_id: [option_ids]}
+        self._waiting = []  # Futures of the saves merged into _pending
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._full = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None  # Started by the first save: CLI commands never need it
+
+    def save(self, user_id, quiz_id, delta, timeout=30):
+        """Merge a delta into the draft; blocks until it is committed and re-raises the error if it failed."""
+        done = Future()
+        with self._lock:
+            if self._stopping.is_set():
+                raise RuntimeError('Autosave is shutting down')
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='draft-writer', daemon=True)
+                self._thread.start()
+            self._pending.setdefault((user_id, quiz_id), {}).update(delta)
+            self._waiting.append(done)
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+        self._wake.set()
+        done.result(timeout=timeout)
+
+    def load(self, user_id, quiz_id):
+        """The saved draft of a participant, without the questions whose options were all unchecked.
+
+        Leaving those out makes the draft score like a form post of the same answers.
+        """
+        row = db.session.execute(
+            select(answer_drafts.c.selections)
+            .where(answer_drafts.c.user_id == user_id, answer_drafts.c.quiz_id == quiz_id)
+        ).scalar()
+        selections = {int(question_id): option_ids for question_id, option_ids in json.loads(row or '{}').items()}
+        return {question_id: option_ids for question_id, option_ids in selections.items() if option_ids}
+
+    def shutdown(self, timeout=10):
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            self._stopping.set()
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            if not self._stopping.is_set():
+                self._full.wait(self.max_delay)  # Let the other clicks of this moment join
+            self._wake.clear()
+            self._full.clear()
+            self._flush()
+            if self._stopping.is_set():
+                with self._lock:
+                    if not self._pending:
+                        return
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            waiting, self._waiting = self._waiting, []
+        if not pending:
+            return
+
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                write_drafts(connection, pending, datetime.utcnow())
+        except Exception as e:
+            print(f"Autosave of {len(pending)} drafts failed: {e}")
+            for done in waiting:
+                done.set_exception(e)  # The client keeps its delta and sends it again
+            return
+        for done in waiting:
+            done.set_result(None)
+
+
+def write_drafts(connection, pending, now):
+    """Upsert {(user_id, quiz_id): delta} drafts, skipping those whose attempt is already stored."""
+    values = select(
+        bindparam('draft_user_id'), bindparam('draft_quiz_id'),
+        bindparam('draft_selections', type_=answer_drafts.c.selections.type),
+        bindparam('draft_updated_at', type_=answer_drafts.c.updated_at.type),
+    ).where(~exists().where(and_(
+        attempts.c.user_id == bindparam('draft_user_id'),
+        attempts.c.quiz_id == bindparam('draft_quiz_id'),
+    )))
+    statement = sqlite_insert(answer_drafts).from_select(['user_id', 'quiz_id', 'selections', 'updated_at'], values)
+    statement = statement.on_conflict_do_update(
+        index_elements=['user_id', 'quiz_id'],
+        set_={
+            'selections': func.json_patch(answer_drafts.c.selections, statement.excluded.selections),
+            'updated_at': statement.excluded.updated_at,
+        }
+    )
+    connection.execute(statement, [
+        {'draft_user_id': user_id, 'draft_quiz_id': quiz_id, 'draft_updated_at': now,
+         'draft_selections': json.dumps({str(question_id): option_ids for question_id, option_ids in delta.items()})}
+        for (user_id, quiz_id), delta in pending.items()
+    ])
+
+
+def delete_drafts(connection, keys):
+    """Delete the drafts of (user_id, quiz_id) pairs; called in the transaction storing their attempts."""
+    if keys:
+        connection.execute(
+            delete(answer_drafts).where(and_(
+                answer_drafts.c.user_id == bindparam('draft_user_id'),
+                answer_drafts.c.quiz_id == bindparam('draft_quiz_id'),
+            )),
+            [{'draft_user_id': user_id, 'draft_quiz_id': quiz_id} for user_id, quiz_id in keys]
+        )
+
+
+def init_app(app):
+    buffer = DraftBuffer(
+        app,
+        max_delay=app.config.get('AUTOSAVE_MAX_DELAY', 0.05),
+        max_batch=app.config.get('AUTOSAVE_MAX_BATCH', 500)
+    )
+    app.extensions['draft_buffer'] = buffer
+    atexit.register(buffer.shutdown)  # Write the last deltas on shutdown
+
+
+# Request-side helpers, for the buffer of the current app
+
+def save(user_id, quiz_id, delta):
+    current_app.extensions['draft_buffer'].save(user_id, quiz_id, delta)
+
+
+def load(user_id, quiz_id):
+    return current_app.extensions['draft_buffer'].load(user_id, quiz_id)
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+import csv
+import io
+import tempfile
+import zlib
+
+from models import db, User, Quiz, Attempt
+
+EXPORT_COLUMNS = ["Nom", "Prénom", "CIN", "Service", "Site", "Formation", "Points", "Resultat", "Date"]
+SHEET_NAME = 'Evalution Formation'
+
+# Rows fetched from the database per round trip
+CHUNK_SIZE = 1000
+
+
+def parse_filters(args):
+    """Read the export filters from the request query string."""
+    filters = {}
+    if args.get('quiz_id', '').isdigit():
+        filters['quiz_id'] = int(args['quiz_id'])
+    for name in ('site', 'service', 'status'):
+        if args.get(name):
+            filters[name] = args[name]
+    for name in ('date_from', 'date_to'):
+        if args.get(name):
+            try:
+                filters[name] = datetime.strptime(args[name], '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f"{name} must be a date formatted as YYYY-MM-DD")
+    return filters
+
+
+def export_query(filters):
+    """One joined query for every exported row, in attempt order."""
+    query = (
+        db.session.query(
+            User.last_name, User.first_name, User.cin, User.service, User.site,
+            Quiz.title, Attempt.score, Attempt.status, Attempt.time
+        )
+        .select_from(Attempt)
+        .join(User, User.id == Attempt.user_id)
+        .join(Quiz, Quiz.id == Attempt.quiz_id)
+        .order_by(Attempt.id)
+    )
+    return apply_attempt_filters(query, filters)
+
+
+def apply_attempt_filters(query, filters):
+    """Filter a query joining Attempt and User by the parse_filters() result."""
+    if 'quiz_id' in filters:
+        query = query.filter(Attempt.quiz_id == filters['quiz_id'])
+    if 'site' in filters:
+        query = query.filter(User.site == filters['site'])
+    if 'service' in filters:
+        query = query.filter(User.service == filters['service'])
+    if 'status' in filters:
+        query = query.filter(Attempt.status == filters['status'])
+    if 'date_from' in filters:
+        query = query.filter(Attempt.time >= filters['date_from'])
+    if 'date_to' in filters:
+        # date_to is inclusive: keep the whole day
+        query = query.filter(Attempt.time < filters['date_to'] + timedelta(days=1))
+    return query
+
+
+def iter_rows(filters):
+    # yield_per streams the result in chunks instead of loading every row
+    for row in export_query(filters).yield_per(CHUNK_SIZE):
+        yield tuple(row)
+
+
+def write_xlsx(filters):
+    """Write the export to a temporary XLSX file and return it, positioned at the start.
+
+    xlsxwriter's constant_memory mode flushes each row to disk as soon as
+    the next one starts, so memory stays flat whatever the row count.
+    """
+    import xlsxwriter  # Deferred: only the export route needs it
+
+    output = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    worksheet = workbook.add_worksheet(SHEET_NAME)
+    worksheet.write_row(0, 0, EXPORT_COLUMNS)
+    for row_index, row in enumerate(iter_rows(filters), start=1):
+        worksheet.write_row(row_index, 0, row)
+    workbook.close()
+
+    output.seek(0)
+    return output
+
+
+def iter_csv(filters, compress=False):
+    """Yield the export as CSV chunks, optionally gzip-compressed on the fly."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31 writes a gzip header
+
+    def take():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+        return compressor.compress(data) if compressor else data
+
+    buffer.write('\ufeff')  # BOM so Excel opens the accents correctly
+    writer.writerow(EXPORT_COLUMNS)
+    rows = 0
+    for row in iter_rows(filters):
+        writer.writerow(row)
+        rows += 1
+        if rows % CHUNK_SIZE == 0:
+            chunk = take()
+            if chunk:
+                yield chunk
+
+    chunk = take()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,154 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+import atexit
+import os
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+from models import db
+
+
+class HashingBusy(Exception):
+    """Too many password hashes are already waiting for a worker."""
+
+
+def hash_password(password, method=None):
+    """Hash with method, or with Werkzeug's default (scrypt) when it is None."""
+    if method is None:
+        return generate_password_hash(password)
+    return generate_password_hash(password, method)
+
+
+class HashingService:
+    """Runs password hashing in a process pool with a bounded queue.
+
+    Werkzeug's scrypt (or PBKDF2 with 600k iterations) costs tens to
+    hundreds of milliseconds of CPU per call. Running it in worker processes keeps request threads free to serve
+    the quiz while a whole shift logs in, and the bounded queue turns an
+    overload into a quick "try again" instead of a pile-up.
+    """
+
+    def __init__(self, method=None, workers=None, max_pending=None, queue_timeout=5):
+        self._executor = None
+        self._lock = Lock()
+        self.configure(method, workers, max_pending, queue_timeout)
+
+    def configure(self, method, workers=None, max_pending=None, queue_timeout=5):
+        self.shutdown()
+        self.method = method
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(self.workers, 1) * 4
+        self.queue_timeout = queue_timeout
+        self._slots = BoundedSemaphore(self.max_pending)
+
+    def _get_executor(self):
+        # Created on first use, so forked server workers each get their own pool
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, function, *args):
+        if self.workers <= 0:
+            return function(*args)  # Pool disabled: hash on the request thread
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy(f'{self.max_pending} password hashes already pending')
+        try:
+            return self._get_executor().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def check(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def generate(self, password):
+        return self._run(hash_password, password, self.method)
+
+    def needs_rehash(self, pwhash):
+        # Stored hashes look like 'scrypt:32768:8:1$salt$hash'. Without a
+        # configured method nothing is rehashed: existing hashes are already
+        # Werkzeug's default, and rehashing would cost a second full hash at
+        # every first login after a deploy
+        return self.method is not None and pwhash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+class FailedLoginThrottle:
+    """Blocks a client after too many failed logins within a sliding window."""
+
+    def __init__(self, max_failures=5, window=300, max_clients=10000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_clients = max_clients
+        self._failures = OrderedDict()  # client -> deque of failure times
+        self._lock = Lock()
+
+    def _recent(self, client, now):
+        failures = self._failures.get(client)
+        if failures is None:
+            return None
+        while failures and failures[0] < now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[client]
+            return None
+        return failures
+
+    def is_blocked(self, client):
+        if self.max_failures <= 0:
+            return False
+        with self._lock:
+            failures = self._recent(client, time.monotonic())
+            return failures is not None and len(failures) >= self.max_failures
+
+    def record_failure(self, client):
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(client, now)
+            if failures is None:
+                failures = self._failures[client] = deque(maxlen=max(self.max_failures, 1))
+            failures.append(now)
+            self._failures.move_to_end(client)
+            while len(self._failures) > self.max_clients:
+                self._failures.popitem(last=False)  # Forget the least recent client
+
+    def reset(self, client):
+        with self._lock:
+            self._failures.pop(client, None)
+
+
+service = HashingService()
+throttle = FailedLoginThrottle()
+
+
+def rehash_if_needed(principal, password):
+    """Re-hash a just-verified password when PASSWORD_HASH_METHOD is set to another method."""
+    if not service.needs_rehash(principal.password):
+        return
+    try:
+        principal.password = service.generate(password)
+        db.session.commit()
+    except HashingBusy:
+        pass  # Not urgent, the next login will try again
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error while upgrading password hash: {e}")
+
+
+def init_app(app):
+    service.configure(
+        method=app.config.get('PASSWORD_HASH_METHOD'),
+        workers=app.config.get('HASH_WORKERS'),
+        max_pending=app.config.get('HASH_MAX_PENDING'),
+        queue_timeout=app.config.get('HASH_QUEUE_TIMEOUT', 5)
+    )
+    throttle.max_failures = app.config.get('LOGIN_MAX_FAILURES', 5)
+    throttle.window = app.config.get('LOGIN_FAILURE_WINDOW', 300)
+    atexit.register(service.shutdown)
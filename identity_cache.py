@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from threading import Lock
+import time
+
+from sqlalchemy import event
+from models import db, User, Admin
+
+
+class IdentityCache:
+    """Bounded LRU of loaded principals (users and admins) with a time to live.
+
+    Keys are the Flask-Login ids ('user_<id>' / 'admin_<id>'). Cached
+    objects are expunged from their session, so later commits can't expire
+    them; only their column attributes may be used.
+    """
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, principal)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        if self.max_size <= 0:
+            return loader(key)  # Cache disabled
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        principal = loader(key)
+        if principal is None:
+            return None  # Unknown or deleted principals are not cached
+        db.session.expunge(principal)
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return principal
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+cache = IdentityCache()
+
+
+def _invalidate_principal(mapper, connection, target):
+    cache.invalidate(target.get_id())
+
+
+# Any ORM update (e.g. a password change) or deletion drops the cached copy
+for model in (User, Admin):
+    event.listen(model, 'after_update', _invalidate_principal)
+    event.listen(model, 'after_delete', _invalidate_principal)
+
+
+def init_app(app):
+    cache.max_size = app.config.get('IDENTITY_CACHE_SIZE', 1000)
+    cache.ttl = app.config.get('IDENTITY_CACHE_TTL', 300)
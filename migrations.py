@@ -0,0 +1,74 @@
+import click
+from sqlalchemy import inspect, select, func
+from models import db
+import stats
+
+
+def pending_indexes(connection):
+    """Indexes declared in models.py that are missing from an existing database."""
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue  # create_all creates the table together with its indexes
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                yield index
+
+
+def find_duplicates(connection, index, limit=10):
+    """Rows that would violate a unique index, as (column values..., count)."""
+    columns = list(index.columns)
+    query = (
+        select(*columns, func.count().label('count'))
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .limit(limit)
+    )
+    return connection.execute(query).all()
+
+
+def upgrade(connection):
+    """Bring an existing database up to the schema in models.py, in place.
+
+    Missing tables and indexes are created, and new rollup tables are
+    filled from the existing attempts and users. Existing rows are never
+    modified or deleted: a unique index whose columns already hold
+    duplicates is skipped and reported so the data can be fixed by hand.
+    Returns a list of (table or index name, action, duplicates).
+    """
+    inspector = inspect(connection)
+    missing_tables = [table.name for table in db.metadata.sorted_tables if not inspector.has_table(table.name)]
+    indexes = list(pending_indexes(connection))
+    db.metadata.create_all(connection)
+
+    report = [(name, 'created', []) for name in missing_tables]
+    if 'AttemptStats' in missing_tables or 'UserStats' in missing_tables:
+        # New rollup tables start empty: fill them from the existing data
+        stats.rebuild(connection)
+        report.append(('AttemptStats, UserStats', 'rebuilt', []))
+
+    for index in indexes:
+        if index.unique:
+            duplicates = find_duplicates(connection, index)
+            if duplicates:
+                report.append((index.name, 'skipped', duplicates))
+                continue
+        index.create(connection)
+        report.append((index.name, 'created', []))
+    return report
+
+
+def init_app(app):
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Add missing tables and indexes to the configured database."""
+        with db.engine.begin() as connection:
+            report = upgrade(connection)
+
+        if not report:
+            click.echo('Database schema is up to date.')
+        for name, action, duplicates in report:
+            click.echo(f'{action:<8} {name}')
+            for row in duplicates:
+                click.echo(f'         duplicate {tuple(row[:-1])} x{row[-1]}')
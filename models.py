@@ -14,6 +14,12 @@ class User(db.Model, UserMixin):
     site = db.Column(db.String, nullable=False)
     password = db.Column(db.String, nullable=False)
 
+    __table_args__ = (
+        db.Index('uq_users_emp_id', 'emp_id', unique=True),
+        db.Index('uq_users_cin', 'cin', unique=True),
+        db.Index('ix_users_site_service', 'site', 'service'),
+    )
+
     def get_id(self):
         return f"user_{self.id}"
 
@@ -37,6 +43,10 @@ class Quiz(db.Model):
     is_active = db.Column(db.Boolean, default=False)  # Add this field
     questions = db.relationship("Question", back_populates="quiz")
 
+    __table_args__ = (
+        db.Index('ix_quizzes_is_active', 'is_active'),
+    )
+
 class Question(db.Model):
     __tablename__ = 'Questions'
     id = db.Column(db.Integer, primary_key=True)
@@ -46,6 +56,10 @@ class Question(db.Model):
     translations = db.relationship("QuestionTranslation", back_populates="question")
     options = db.relationship("Option", back_populates="question")
 
+    __table_args__ = (
+        db.Index('ix_questions_quiz_id', 'quiz_id'),
+    )
+
 class QuestionTranslation(db.Model):
     __tablename__ = 'QuestionTrans'
     id = db.Column(db.Integer, primary_key=True)
@@ -54,6 +68,10 @@ class QuestionTranslation(db.Model):
     title = db.Column(db.String, nullable=False)
     question = db.relationship("Question", back_populates="translations")
 
+    __table_args__ = (
+        db.Index('uq_question_trans_question_language', 'question_id', 'language', unique=True),
+    )
+
 class Option(db.Model):
     __tablename__ = 'Options'
     id = db.Column(db.Integer, primary_key=True)
@@ -63,6 +81,10 @@ class Option(db.Model):
     question = db.relationship("Question", back_populates="options")
     translations = db.relationship("OptionTranslation", back_populates="option")
 
+    __table_args__ = (
+        db.Index('ix_options_question_id', 'question_id'),
+    )
+
 class OptionTranslation(db.Model):
     __tablename__ = 'OptionTrans'
     id = db.Column(db.Integer, primary_key=True)
@@ -71,6 +93,10 @@ class OptionTranslation(db.Model):
     text = db.Column(db.String, nullable=False)
     option = db.relationship("Option", back_populates="translations")
 
+    __table_args__ = (
+        db.Index('uq_option_trans_option_language', 'option_id', 'language', unique=True),
+    )
+
 class Attempt(db.Model):
     __tablename__ = 'Attempts'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -84,10 +110,71 @@ class Attempt(db.Model):
     quiz = db.relationship('Quiz', backref='attempts')
     answers = db.relationship("Answer", backref="attempts")
 
+    __table_args__ = (
+        # One attempt per user per quiz
+        db.Index('uq_attempts_user_quiz', 'user_id', 'quiz_id', unique=True),
+        db.Index('ix_attempts_quiz_id', 'quiz_id'),
+        db.Index('ix_attempts_time', 'time'),
+    )
+
 class Answer(db.Model):
     __tablename__ = 'Answers'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     attempt_id = db.Column(db.Integer, db.ForeignKey('Attempts.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('Questions.id'), nullable=False)
     option_id = db.Column(db.Integer, db.ForeignKey('Options.id'), nullable=False)
-    is_correct = db.Column(db.Boolean, nullable=False)
\ No newline at end of file
+    is_correct = db.Column(db.Boolean, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_answers_attempt_id', 'attempt_id'),
+    )
+
+# Compact answer storage of answer_store.py (ANSWER_STORAGE = 'packed'):
+# one row per attempt whose masks hold, for each question of the layout,
+# a bitmask of the selected options. A layout is the list of questions,
+# options and correct options of a quiz at the time it was answered; it
+# never changes, an edited quiz gets a new one.
+class QuizLayout(db.Model):
+    __tablename__ = 'QuizLayouts'
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('Quizzes.id'), nullable=False)
+    fingerprint = db.Column(db.String, nullable=False)
+    questions = db.Column(db.Text, nullable=False)  # JSON [[question_id, [option_ids], [correct_ids]], ...]
+
+    __table_args__ = (
+        db.Index('uq_quiz_layouts_fingerprint', 'fingerprint', unique=True),
+    )
+
+class PackedAnswer(db.Model):
+    __tablename__ = 'PackedAnswers'
+    attempt_id = db.Column(db.Integer, db.ForeignKey('Attempts.id'), primary_key=True, autoincrement=False)
+    layout_id = db.Column(db.Integer, db.ForeignKey('QuizLayouts.id'), nullable=False)
+    masks = db.Column(db.LargeBinary, nullable=False)
+
+# Rollups maintained by stats.py in the same transaction as each attempt and
+# registration, so the dashboard never has to scan Attempts or Users.
+class AttemptStats(db.Model):
+    __tablename__ = 'AttemptStats'
+    quiz_id = db.Column(db.Integer, db.ForeignKey('Quizzes.id'), primary_key=True)
+    site = db.Column(db.String, primary_key=True)
+    service = db.Column(db.String, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    min_score = db.Column(db.Integer)
+    max_score = db.Column(db.Integer)
+
+class UserStats(db.Model):
+    __tablename__ = 'UserStats'
+    site = db.Column(db.String, primary_key=True)
+    service = db.Column(db.String, primary_key=True)
+    users = db.Column(db.Integer, nullable=False, default=0)
+
+# In-progress selections autosaved by drafts.py while a quiz is being taken:
+# a JSON object {"<question_id>": [option_ids]}, one row per participant
+class AnswerDraft(db.Model):
+    __tablename__ = 'AnswerDrafts'
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('Quizzes.id'), primary_key=True)
+    selections = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,154 @@
+import os
+import time
+
+from flask import g, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db
+
+# Prometheus metrics, served at /metrics. prometheus_client is imported in
+# init_app, after PROMETHEUS_MULTIPROC_DIR is set, so every metric object
+# is created there; the record_* helpers do nothing until then.
+#
+# With several worker processes (gunicorn, uwsgi), set METRICS_MULTIPROC_DIR
+# to an empty directory shared by the workers and wipe it before starting
+# the server. Every worker writes its samples there and /metrics adds them
+# up, whichever worker serves the scrape. Under gunicorn, also call
+# monitoring.mark_process_dead(worker.pid) from the child_exit hook.
+
+# Seconds; quiz pages are fast, exports and dashboards can take a while
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+_metrics = None
+
+
+class _Metrics:
+    def __init__(self, prometheus_client):
+        Counter = prometheus_client.Counter
+        Gauge = prometheus_client.Gauge
+        Histogram = prometheus_client.Histogram
+
+        self.request_latency = Histogram(
+            'quiz_http_request_duration_seconds', 'Request latency by endpoint',
+            ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+        self.requests = Counter(
+            'quiz_http_requests_total', 'Requests by endpoint and status code',
+            ['endpoint', 'method', 'status'])
+        self.in_flight = Gauge(
+            'quiz_http_requests_in_flight', 'Requests being served',
+            multiprocess_mode='livesum')
+        self.pool_wait = Histogram(
+            'quiz_db_pool_checkout_seconds', 'Time spent waiting for a database connection from the pool',
+            buckets=POOL_WAIT_BUCKETS)
+        self.lock_errors = Counter(
+            'quiz_sqlite_lock_errors_total', 'Statements that failed with "database is locked" or "busy"')
+        self.batch_retries = Counter(
+            'quiz_submission_batch_retries_total', 'Group commits that failed and were retried one submission at a time')
+        self.submissions = Counter(
+            'quiz_submissions_total', 'Stored quiz attempts by result',
+            ['status'])
+
+
+def _start_request():
+    g._metrics_started = time.perf_counter()
+    _metrics.in_flight.inc()
+
+
+def _count_response(response):
+    g._metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return
+    _metrics.in_flight.dec()
+    endpoint = request.endpoint or 'unmatched'  # Raw paths would make the label set unbounded
+    status = 500 if exc is not None else g.pop('_metrics_status', 500)
+    _metrics.request_latency.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    _metrics.requests.labels(endpoint, request.method, str(status)).inc()
+
+
+def _count_lock_errors(context):
+    message = str(context.original_exception).lower()
+    if 'database is locked' in message or 'database is busy' in message:
+        _metrics.lock_errors.inc()
+
+
+def _time_pool_checkouts(pool):
+    # The pool has no event for the start of a checkout, so time connect() itself
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            _metrics.pool_wait.observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+def record_submission(status):
+    if _metrics is not None:
+        _metrics.submissions.labels(status).inc()
+
+
+def record_batch_retry():
+    if _metrics is not None:
+        _metrics.batch_retries.inc()
+
+
+def mark_process_dead(pid):
+    """Drop the live gauges of a dead worker; for gunicorn's child_exit hook."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(pid)
+
+
+def init_app(app):
+    global _metrics
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = multiproc_dir
+
+    try:
+        import prometheus_client
+    except ImportError:
+        print("prometheus_client is not installed, /metrics is disabled")
+        return
+
+    if _metrics is None:  # Metrics can only be registered once per process
+        _metrics = _Metrics(prometheus_client)
+
+    if multiproc_dir:
+        from prometheus_client import multiprocess
+
+        def collect():
+            # A fresh registry on each scrape reads the files of all workers
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return prometheus_client.generate_latest(registry)
+    else:
+        def collect():
+            return prometheus_client.generate_latest()
+
+    def metrics():
+        # content_type, not mimetype: Werkzeug would append a second charset
+        # to CONTENT_TYPE_LATEST, which already has one, and Prometheus
+        # rejects the duplicate parameter
+        return Response(collect(), content_type=prometheus_client.CONTENT_TYPE_LATEST,
+                        headers={'Cache-Control': 'no-store'})
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+    app.before_request(_start_request)
+    app.after_request(_count_response)
+    app.teardown_request(_finish_request)
+    event.listen(Engine, 'handle_error', _count_lock_errors)
+    with app.app_context():
+        _time_pool_checkouts(db.engine.pool)
@@ -0,0 +1,89 @@
+from collections import namedtuple
+from datetime import datetime
+import base64
+import json
+
+from flask import url_for
+from sqlalchemy import and_, or_
+from models import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# rows is the page; next_cursor / prev_cursor are None at either end
+Page = namedtuple('Page', ['rows', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(value, row_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, column):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if isinstance(column.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid page cursor')
+
+
+def page_size(args):
+    try:
+        size = int(args.get('per_page', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, sort_column, id_column, descending=False, after=None, before=None, size=DEFAULT_PAGE_SIZE,
+                row_key=None):
+    """Fetch one page of query ordered by (sort_column, id_column).
+
+    Pages are addressed by the sort key of the last (after) or first
+    (before) row shown rather than by OFFSET, so every page costs the same
+    index range scan however deep it is. row_key(row) returns the
+    (sort value, id) of a result row.
+    """
+    backwards = before is not None
+    cursor = before if backwards else after
+
+    if cursor is not None:
+        value, row_id = decode_cursor(cursor, sort_column)
+        # Rows strictly past the cursor in the direction we are reading
+        greater = descending == backwards
+        if greater:
+            condition = or_(sort_column > value, and_(sort_column == value, id_column > row_id))
+        else:
+            condition = or_(sort_column < value, and_(sort_column == value, id_column < row_id))
+        query = query.filter(condition)
+
+    ascending = descending == backwards
+    if ascending:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    else:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+
+    rows = query.limit(size + 1).all()
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return Page(rows, None, None)
+
+    first = encode_cursor(*row_key(rows[0]))
+    last = encode_cursor(*row_key(rows[-1]))
+    if backwards:
+        return Page(rows, last, first if has_more else None)
+    return Page(rows, last if has_more else None, first if cursor is not None else None)
+
+
+def page_url(endpoint, args, **changes):
+    """URL of endpoint with the current query string, minus cursors, plus changes."""
+    params = {key: value for key, value in args.items() if key not in ('after', 'before')}
+    params.update(changes)
+    return url_for(endpoint, **{key: value for key, value in params.items() if value not in (None, '')})
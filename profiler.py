@@ -0,0 +1,195 @@
+from collections import Counter, deque, namedtuple
+from threading import Lock
+import time
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# One profiled request; times in milliseconds
+RequestSample = namedtuple('RequestSample', ['wall_ms', 'sql_count', 'sql_ms', 'template_ms', 'status'])
+
+# A statement run many times by a single request, typically a query in a
+# loop that should be a join or an IN (...) lookup
+RepeatedQuery = namedtuple('RepeatedQuery', ['endpoint', 'statement', 'count', 'request_sql_ms', 'at'])
+
+
+class _RequestProfile:
+    __slots__ = ('started', 'sql_count', 'sql_ms', 'template_ms', 'template_started', 'statements', 'status')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.template_started = None
+        self.statements = Counter()  # statement -> times run
+        self.status = None
+
+
+class Profiler:
+    """Per-endpoint request timings kept in bounded ring buffers.
+
+    Only installed by init_app when PROFILER_ENABLED is set; otherwise no
+    hook or event listener is registered at all.
+    """
+
+    def __init__(self, samples=500, repeat_threshold=10):
+        self.samples = samples
+        self.repeat_threshold = repeat_threshold
+        self._endpoints = {}  # endpoint -> deque of RequestSample
+        self._repeated = deque(maxlen=100)
+        self._lock = Lock()
+        self.enabled = False
+
+    def record(self, endpoint, sample, repeated):
+        with self._lock:
+            buffer = self._endpoints.get(endpoint)
+            if buffer is None:
+                buffer = self._endpoints[endpoint] = deque(maxlen=self.samples)
+            buffer.append(sample)
+            self._repeated.extend(repeated)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._repeated.clear()
+
+    def summary(self):
+        with self._lock:
+            endpoints = {endpoint: list(buffer) for endpoint, buffer in self._endpoints.items()}
+            repeated = list(self._repeated)
+
+        rows = []
+        for endpoint, samples in endpoints.items():
+            wall = sorted(sample.wall_ms for sample in samples)
+            sql = sorted(sample.sql_ms for sample in samples)
+            count = len(samples)
+            rows.append({
+                'endpoint': endpoint,
+                'requests': count,
+                'wall_p50': _percentile(wall, 50),
+                'wall_p95': _percentile(wall, 95),
+                'wall_p99': _percentile(wall, 99),
+                'wall_max': wall[-1],
+                'sql_count_avg': sum(sample.sql_count for sample in samples) / count,
+                'sql_count_max': max(sample.sql_count for sample in samples),
+                'sql_ms_p50': _percentile(sql, 50),
+                'sql_ms_p95': _percentile(sql, 95),
+                'template_ms_avg': sum(sample.template_ms for sample in samples) / count,
+                'errors': sum(1 for sample in samples if sample.status is None or sample.status >= 500),
+            })
+        rows.sort(key=lambda row: row['wall_p95'], reverse=True)
+
+        return {
+            'enabled': self.enabled,
+            'samples_per_endpoint': self.samples,
+            'repeat_threshold': self.repeat_threshold,
+            'endpoints': rows,
+            'repeated_queries': [query._asdict() for query in reversed(repeated)],
+        }
+
+
+def _percentile(sorted_values, percent):
+    # Nearest rank; the buffers are small enough to sort on every read
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[index]
+
+
+profiler = Profiler()
+
+
+def _current_profile():
+    if has_request_context():
+        return g.get('_profile')
+    return None  # Background threads (e.g. the group commit writer)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is not None:
+        conn.info['profile_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('profile_started', None)
+    profile = _current_profile()
+    if profile is None:
+        return
+    if started is not None:
+        profile.sql_ms += (time.perf_counter() - started) * 1000
+    profile.sql_count += 1
+    # Statements are compared with their bound parameters left out, so the
+    # same query run for each row of a loop shows up as one entry
+    profile.statements[statement] += 1
+
+
+def _statement_failed(exception_context):
+    # after_cursor_execute never runs for a failed statement: clear its start
+    # time here, or it would be charged to the next statement of the connection
+    connection = exception_context.connection
+    started = connection.info.pop('profile_started', None) if connection is not None else None
+    profile = _current_profile()
+    if profile is not None and started is not None:
+        profile.sql_ms += (time.perf_counter() - started) * 1000
+        profile.sql_count += 1
+
+
+def _before_render_template(sender, template, context, **extra):
+    profile = _current_profile()
+    if profile is not None:
+        profile.template_started = time.perf_counter()
+
+
+def _template_rendered(sender, template, context, **extra):
+    profile = _current_profile()
+    if profile is not None and profile.template_started is not None:
+        profile.template_ms += (time.perf_counter() - profile.template_started) * 1000
+        profile.template_started = None
+
+
+def _start_request():
+    g._profile = _RequestProfile()
+
+
+def _capture_status(response):
+    profile = g.get('_profile')
+    if profile is not None:
+        profile.status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return
+    wall_ms = (time.perf_counter() - profile.started) * 1000
+    endpoint = request.endpoint or '<unmatched>'
+
+    repeated = []
+    now = time.time()
+    for statement, count in profile.statements.items():
+        if count >= profiler.repeat_threshold:
+            print(f"Profiler: {endpoint} ran the same query {count} times: {statement[:200]}")
+            repeated.append(RepeatedQuery(endpoint, statement[:500], count, round(profile.sql_ms, 2), now))
+
+    status = 500 if exc is not None else profile.status
+    profiler.record(endpoint, RequestSample(wall_ms, profile.sql_count, profile.sql_ms, profile.template_ms, status),
+                    repeated)
+
+
+def init_app(app):
+    profiler.samples = app.config.get('PROFILER_SAMPLES', 500)
+    profiler.repeat_threshold = app.config.get('PROFILER_REPEAT_THRESHOLD', 10)
+    profiler.enabled = app.config.get('PROFILER_ENABLED', False)
+    if not profiler.enabled:
+        return  # Nothing installed: no per-request or per-statement cost
+
+    app.before_request(_start_request)
+    app.after_request(_capture_status)
+    app.teardown_request(_finish_request)
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _statement_failed)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
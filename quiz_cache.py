@@ -0,0 +1,214 @@
+from collections import namedtuple
+from threading import Lock
+import json
+import time
+
+from flask import current_app, render_template
+from models import db, Quiz, Question, QuestionTranslation, Option, OptionTranslation
+
+# Compiled, read-only view of the active quiz for one language.
+# Namedtuples keep the snapshot compact and immutable, and Jinja reads
+# their fields exactly like the dicts the templates used to receive.
+QuizSnapshot = namedtuple('QuizSnapshot', ['id', 'title', 'language', 'questions', 'version'])
+QuestionSnapshot = namedtuple('QuestionSnapshot', ['id', 'title', 'options'])
+OptionSnapshot = namedtuple('OptionSnapshot', ['id', 'text', 'is_correct'])
+
+# Language independent answer key of a quiz, used for scoring submissions.
+# question_id -> frozenset of option ids, for all options and the correct ones.
+AnswerKey = namedtuple('AnswerKey', ['quiz_id', 'options', 'correct'])
+
+# Default lifetime of a snapshot in seconds. Invalidation only reaches the
+# current process, so other workers pick up admin changes after this delay.
+DEFAULT_TTL = 60
+
+_NO_ACTIVE_QUIZ = object()
+
+_lock = Lock()
+_snapshots = {}  # language -> (expires_at, snapshot or _NO_ACTIVE_QUIZ)
+_answer_keys = {}  # quiz_id -> (expires_at, AnswerKey)
+_pages = {}  # template name -> (snapshot, rendered html)
+_payloads = {}  # language -> (snapshot, JSON text)
+
+# Stand-ins for the per-participant values of the quiz page. They are
+# rendered into the cached page once and substituted on every request;
+# both real values (a uuid and an ISO timestamp) are left as is by HTML
+# escaping, so a plain string replace is enough.
+CSRF_TOKEN_PLACEHOLDER = '__quiz_csrf_token__'
+START_TIME_PLACEHOLDER = '__quiz_start_time__'
+_version = 0
+
+
+def get_active_quiz(language):
+    """Return the compiled snapshot of the active quiz, or None if no quiz is active."""
+    now = time.monotonic()
+    entry = _snapshots.get(language)
+    if entry is None or entry[0] < now:
+        entry = _rebuild(language, now)
+    snapshot = entry[1]
+    return None if snapshot is _NO_ACTIVE_QUIZ else snapshot
+
+
+def invalidate():
+    """Drop every compiled snapshot and answer key; call after any change to quiz data."""
+    global _version
+    with _lock:
+        _version += 1
+        _snapshots.clear()
+        _answer_keys.clear()
+        _pages.clear()
+        _payloads.clear()
+
+
+def get_answer_key(quiz_id):
+    """Return the cached answer key of a quiz, loading it with a single query on a miss."""
+    now = time.monotonic()
+    entry = _answer_keys.get(quiz_id)
+    if entry is None or entry[0] < now:
+        with _lock:
+            version = _version
+        answer_key = load_answer_key(quiz_id)
+        ttl = current_app.config.get('QUIZ_CACHE_TTL', DEFAULT_TTL)
+        entry = (time.monotonic() + ttl, answer_key)
+        with _lock:
+            if version == _version:
+                _answer_keys[quiz_id] = entry
+    return entry[1]
+
+
+def render_quiz_page(template_name, snapshot, csrf_token, start_time):
+    """Render the quiz page, rendering the template only once per snapshot."""
+    entry = _pages.get(template_name)
+    # Keyed on the snapshot object itself: a new snapshot, whether after an
+    # invalidation or a TTL rebuild, always gets a fresh render
+    if entry is None or entry[0] is not snapshot:
+        html = render_template(template_name, quiz=snapshot,
+                               csrf_token=CSRF_TOKEN_PLACEHOLDER, start_time=START_TIME_PLACEHOLDER)
+        entry = (snapshot, html)
+        with _lock:
+            if snapshot.version == _version:
+                _pages[template_name] = entry
+    return entry[1].replace(CSRF_TOKEN_PLACEHOLDER, csrf_token).replace(START_TIME_PLACEHOLDER, start_time)
+
+
+def quiz_json(snapshot):
+    """Compact JSON of a snapshot for the quiz API, serialized once per snapshot.
+
+    Only ids and localized texts: which options are correct never leaves
+    the server.
+    """
+    entry = _payloads.get(snapshot.language)
+    if entry is None or entry[0] is not snapshot:
+        payload = {
+            'id': snapshot.id,
+            'title': snapshot.title,
+            'language': snapshot.language,
+            'questions': [
+                {'id': question.id, 'title': question.title,
+                 'options': [[option.id, option.text] for option in question.options]}
+                for question in snapshot.questions
+            ],
+        }
+        entry = (snapshot, json.dumps(payload, ensure_ascii=False, separators=(',', ':')))
+        with _lock:
+            if snapshot.version == _version:
+                _payloads[snapshot.language] = entry
+    return entry[1]
+
+
+def current_version():
+    return _version
+
+
+def _rebuild(language, now):
+    with _lock:
+        # Another thread may have rebuilt the entry while we waited for the lock
+        entry = _snapshots.get(language)
+        if entry is not None and entry[0] >= now:
+            return entry
+        version = _version
+
+    snapshot = compile_active_quiz(language, version)
+    ttl = current_app.config.get('QUIZ_CACHE_TTL', DEFAULT_TTL)
+    entry = (time.monotonic() + ttl, _NO_ACTIVE_QUIZ if snapshot is None else snapshot)
+
+    with _lock:
+        # Don't store a snapshot that was compiled from data invalidated meanwhile
+        if version == _version:
+            _snapshots[language] = entry
+    return entry
+
+
+def compile_active_quiz(language, version=0):
+    active_quiz = Quiz.query.filter_by(is_active=True).first()
+    if not active_quiz:
+        return None
+
+    questions = (
+        Question.query.options(db.joinedload(Question.options))
+        .filter(Question.quiz_id == active_quiz.id)
+        .order_by(Question.id)
+        .all()
+    )
+
+    # Only the translations of this quiz, not every row for the language
+    questions_translations_dict = dict(
+        db.session.query(QuestionTranslation.question_id, QuestionTranslation.title)
+        .join(Question, Question.id == QuestionTranslation.question_id)
+        .filter(Question.quiz_id == active_quiz.id, QuestionTranslation.language == language)
+        .all()
+    )
+    options_translations_dict = dict(
+        db.session.query(OptionTranslation.option_id, OptionTranslation.text)
+        .join(Option, Option.id == OptionTranslation.option_id)
+        .join(Question, Question.id == Option.question_id)
+        .filter(Question.quiz_id == active_quiz.id, OptionTranslation.language == language)
+        .all()
+    )
+
+    return QuizSnapshot(
+        id=active_quiz.id,
+        title=active_quiz.title,
+        language=language,
+        questions=tuple(
+            QuestionSnapshot(
+                id=question.id,
+                title=questions_translations_dict.get(question.id, question.title),
+                options=tuple(
+                    OptionSnapshot(
+                        id=option.id,
+                        text=options_translations_dict.get(option.id, option.text),
+                        is_correct=option.is_correct
+                    )
+                    for option in sorted(question.options, key=lambda o: o.id)
+                )
+            )
+            for question in questions
+        ),
+        version=version
+    )
+
+
+def load_answer_key(quiz_id):
+    rows = (
+        db.session.query(Question.id, Option.id, Option.is_correct)
+        .outerjoin(Option, Option.question_id == Question.id)
+        .filter(Question.quiz_id == quiz_id)
+        .all()
+    )
+
+    options = {}
+    correct = {}
+    for question_id, option_id, is_correct in rows:
+        options.setdefault(question_id, set())
+        correct.setdefault(question_id, set())
+        if option_id is None:
+            continue  # Question without options
+        options[question_id].add(option_id)
+        if is_correct:
+            correct[question_id].add(option_id)
+
+    return AnswerKey(
+        quiz_id=quiz_id,
+        options={question_id: frozenset(ids) for question_id, ids in options.items()},
+        correct={question_id: frozenset(ids) for question_id, ids in correct.items()}
+    )
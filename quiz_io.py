@@ -0,0 +1,285 @@
+import ast
+import json
+import pprint
+
+import click
+from sqlalchemy import func
+from models import db, Quiz, Question, QuestionTranslation, Option, OptionTranslation
+import quiz_cache
+
+# Every question and option must be translated into these languages
+REQUIRED_TRANSLATIONS = ('fr', 'ar')
+
+# A quiz is exchanged as a plain dict:
+#
+#   {"title": "...", "language": "en",
+#    "questions": [{"title": "...", "translations": {"fr": "...", "ar": "..."},
+#                   "options": [{"text": "...", "is_correct": true,
+#                                "translations": {"fr": "...", "ar": "..."}}]}]}
+#
+# which is what the JSON and YAML files contain.
+
+
+def from_questions_dict(questions, title, base_language='en'):
+    """Convert the initial/questions.txt format to a quiz dict.
+
+    That format holds one list of questions per language, in the same order,
+    with the correct answers given by their text in each language.
+    """
+    if base_language not in questions:
+        raise ValueError(f"No '{base_language}' questions to use as the base language")
+
+    base = questions[base_language]
+    others = {language: items for language, items in questions.items() if language != base_language}
+    for language, items in others.items():
+        if len(items) != len(base):
+            raise ValueError(f"'{language}' has {len(items)} questions, '{base_language}' has {len(base)}")
+
+    quiz = {'title': title, 'language': base_language, 'questions': []}
+    for index, item in enumerate(base):
+        correct = set(item['correct_answers'])
+        question = {
+            'title': item['question'],
+            'translations': {language: items[index]['question'] for language, items in others.items()},
+            'options': [],
+        }
+        for option_index, text in enumerate(item['options']):
+            translations = {}
+            for language, items in others.items():
+                if len(items[index]['options']) != len(item['options']):
+                    raise ValueError(f"Question {index + 1} has a different number of options in '{language}'")
+                translations[language] = items[index]['options'][option_index]
+            question['options'].append({'text': text, 'is_correct': text in correct, 'translations': translations})
+        quiz['questions'].append(question)
+    return quiz
+
+
+def to_questions_dict(quiz):
+    """Inverse of from_questions_dict."""
+    languages = [quiz['language']] + sorted({
+        language for question in quiz['questions'] for language in question['translations']
+    })
+    questions = {language: [] for language in languages}
+    for question in quiz['questions']:
+        for language in languages:
+            def text(item, key):
+                return item[key] if language == quiz['language'] else item['translations'].get(language, item[key])
+            options = [text(option, 'text') for option in question['options']]
+            questions[language].append({
+                'question': text(question, 'title'),
+                'options': options,
+                'correct_answers': [text(option, 'text') for option in question['options'] if option['is_correct']],
+            })
+    return questions
+
+
+def load_file(path, title=None):
+    """Read a quiz from a .json, .yaml/.yml or questions dict (.txt/.py) file."""
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+
+    if path.endswith('.json'):
+        quiz = json.loads(content)
+    elif path.endswith(('.yaml', '.yml')):
+        import yaml  # Deferred: only YAML imports need it
+        quiz = yaml.safe_load(content)
+    else:
+        # 'questions = {...}': a Python literal, never executed as code
+        literal = content.split('=', 1)[1] if content.lstrip().startswith('questions') else content
+        quiz = from_questions_dict(ast.literal_eval(literal.strip()), title or path)
+
+    if title:
+        quiz['title'] = title
+    return quiz
+
+
+def dump_file(quiz, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            json.dump(quiz, f, ensure_ascii=False, indent=2)
+        elif path.endswith(('.yaml', '.yml')):
+            import yaml
+            yaml.safe_dump(quiz, f, allow_unicode=True, sort_keys=False)
+        else:
+            f.write('questions = ' + pprint.pformat(to_questions_dict(quiz), width=120, sort_dicts=False) + '\n')
+
+
+def validate(quiz):
+    """Return a list of problems; an empty list means the quiz can be imported."""
+    errors = []
+    if not quiz.get('title'):
+        errors.append('Quiz title is required.')
+    if not quiz.get('language'):
+        errors.append('Quiz language is required.')
+    if not quiz.get('questions'):
+        errors.append('The quiz must have at least one question.')
+
+    for number, question in enumerate(quiz.get('questions', []), start=1):
+        if not question.get('title'):
+            errors.append(f'Question {number} has no title.')
+        options = question.get('options', [])
+        if len(options) < 2:
+            errors.append(f'Question {number} must have at least two options.')
+        if not any(option.get('is_correct') for option in options):
+            errors.append(f'Question {number} must have at least one option marked as correct.')
+        for language in REQUIRED_TRANSLATIONS:
+            if not question.get('translations', {}).get(language):
+                errors.append(f"Question {number} has no '{language}' translation.")
+        for option_number, option in enumerate(options, start=1):
+            if not option.get('text'):
+                errors.append(f'Option {option_number} of question {number} has no text.')
+            for language in REQUIRED_TRANSLATIONS:
+                if not option.get('translations', {}).get(language):
+                    errors.append(f"Option {option_number} of question {number} has no '{language}' translation.")
+    return errors
+
+
+def create_quiz(quiz, is_active=False):
+    """Insert a validated quiz with all its translations in one transaction; returns its id.
+
+    Ids are allocated up front so every table is written with a single
+    executemany. This is safe on SQLite: once the quiz row is inserted the
+    transaction holds the database write lock, so no one else can insert
+    rows between reading max(id) and our inserts.
+    """
+    errors = validate(quiz)
+    if errors:
+        raise ValueError(' '.join(errors))
+
+    try:
+        new_quiz = Quiz(title=quiz['title'], language=quiz['language'], is_active=is_active)
+        db.session.add(new_quiz)
+        db.session.flush()  # Takes the write lock and assigns the quiz id
+
+        next_question_id = (db.session.query(func.max(Question.id)).scalar() or 0) + 1
+        next_option_id = (db.session.query(func.max(Option.id)).scalar() or 0) + 1
+
+        questions, question_translations, options, option_translations = [], [], [], []
+        for question in quiz['questions']:
+            question_id = next_question_id
+            next_question_id += 1
+            questions.append({'id': question_id, 'quiz_id': new_quiz.id, 'title': question['title']})
+            question_translations.extend(
+                {'question_id': question_id, 'language': language, 'title': title}
+                for language, title in question['translations'].items()
+            )
+            for option in question['options']:
+                option_id = next_option_id
+                next_option_id += 1
+                options.append({'id': option_id, 'question_id': question_id,
+                                'text': option['text'], 'is_correct': bool(option['is_correct'])})
+                option_translations.extend(
+                    {'option_id': option_id, 'language': language, 'text': text}
+                    for language, text in option['translations'].items()
+                )
+
+        for model, rows in ((Question, questions), (QuestionTranslation, question_translations),
+                            (Option, options), (OptionTranslation, option_translations)):
+            if rows:
+                db.session.execute(model.__table__.insert(), rows)
+
+        quiz_id = new_quiz.id
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    quiz_cache.invalidate()
+    return quiz_id
+
+
+def export_quiz(quiz_id):
+    """Read a quiz back into the dict format, with four queries."""
+    quiz = Quiz.query.get(quiz_id)
+    if quiz is None:
+        raise ValueError(f'Quiz {quiz_id} not found')
+
+    questions = Question.query.filter_by(quiz_id=quiz_id).order_by(Question.id).all()
+    question_translations = {}
+    for translation in (QuestionTranslation.query.join(Question)
+                        .filter(Question.quiz_id == quiz_id).all()):
+        question_translations.setdefault(translation.question_id, {})[translation.language] = translation.title
+
+    options = {}
+    option_translations = {}
+    for option, translation in (
+        db.session.query(Option, OptionTranslation)
+        .join(Question, Question.id == Option.question_id)
+        .outerjoin(OptionTranslation, OptionTranslation.option_id == Option.id)
+        .filter(Question.quiz_id == quiz_id)
+        .order_by(Option.id)
+    ):
+        options.setdefault(option.question_id, {})[option.id] = option
+        if translation is not None:
+            option_translations.setdefault(option.id, {})[translation.language] = translation.text
+
+    return {
+        'title': quiz.title,
+        'language': quiz.language,
+        'questions': [
+            {
+                'title': question.title,
+                'translations': question_translations.get(question.id, {}),
+                'options': [
+                    {'text': option.text, 'is_correct': option.is_correct,
+                     'translations': option_translations.get(option.id, {})}
+                    for option in options.get(question.id, {}).values()
+                ],
+            }
+            for question in questions
+        ],
+    }
+
+
+def from_form(data):
+    """Build a quiz dict from the admin create_quiz form (static/js/create_quiz.js)."""
+    question_indices = sorted(set(
+        int(key.split('[')[1].split(']')[0]) for key in data if key.startswith('questions') and 'title' in key
+    ))
+
+    questions = []
+    for q_idx in question_indices:
+        option_keys = [key for key in data if key.startswith(f'questions[{q_idx}][options]')]
+        option_indices = sorted(set(int(key.split('[')[3].split(']')[0]) for key in option_keys if 'text' in key))
+        questions.append({
+            'title': data.get(f'questions[{q_idx}][title]'),
+            'translations': {lang: data.get(f'translations[{q_idx}][{lang}]') for lang in REQUIRED_TRANSLATIONS},
+            'options': [
+                {
+                    'text': data.get(f'questions[{q_idx}][options][{o_idx}][text]'),
+                    'is_correct': data.get(f'questions[{q_idx}][options][{o_idx}][is_correct]') == 'true',
+                    'translations': {lang: data.get(f'translations[{q_idx}][options][{o_idx}][{lang}]')
+                                     for lang in REQUIRED_TRANSLATIONS},
+                }
+                for o_idx in option_indices
+            ],
+        })
+    return {'title': data.get('title'), 'language': data.get('language'), 'questions': questions}
+
+
+def init_app(app):
+    @app.cli.command('import-quiz')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--title', help='Quiz title (required for questions dict files).')
+    @click.option('--activate', is_flag=True, help='Make it the active quiz.')
+    def import_quiz_command(path, title, activate):
+        """Import a quiz from a JSON, YAML or questions dict file."""
+        try:
+            quiz = load_file(path, title)
+            if activate:
+                Quiz.query.update({'is_active': False})
+            quiz_id = create_quiz(quiz, is_active=activate)
+        except (ValueError, SyntaxError) as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Imported quiz {quiz_id} with {len(quiz['questions'])} questions.")
+
+    @app.cli.command('export-quiz')
+    @click.argument('quiz_id', type=int)
+    @click.argument('path', type=click.Path(dir_okay=False, writable=True))
+    def export_quiz_command(quiz_id, path):
+        """Export a quiz to a JSON, YAML or questions dict (.txt) file."""
+        try:
+            dump_file(export_quiz(quiz_id), path)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Exported quiz {quiz_id} to {path}.')
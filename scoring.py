@@ -0,0 +1,128 @@
+from collections import namedtuple
+
+# Define the passing score threshold (as a percentage)
+PASSING_SCORE_PERCENTAGE = 75
+
+# answers is a list of (question_id, option_id, is_correct) tuples, one per
+# selected option, ready to be written as Answer rows.
+ScoreResult = namedtuple('ScoreResult', ['score', 'max_score', 'percentage', 'status', 'question_scores', 'answers'])
+
+
+class InvalidSubmission(ValueError):
+    """A submission references a question or option that is not part of the quiz."""
+
+
+def selections_from_form(form):
+    """Turn the quiz form (one `question_<id>` field per checked option) into {question_id: [option_ids]}."""
+    selections = {}
+    for key in form.keys():
+        if not key.startswith('question_'):
+            continue
+        parts = key.split('_')
+        if len(parts) != 2 or not parts[1].isdigit():
+            continue
+
+        option_ids = []
+        for option_id in form.getlist(key):
+            try:
+                option_ids.append(int(option_id))
+            except ValueError:
+                continue  # Skip invalid option IDs
+        selections[int(parts[1])] = option_ids
+    return selections
+
+
+def selections_from_json(data, keep_empty=False):
+    """Validate a JSON submission body ({"<question_id>": [option_ids]}) into {question_id: [option_ids]}.
+
+    Questions sent with no option are dropped, as the form never posts
+    unanswered questions. keep_empty keeps them for autosave deltas, where
+    [] means the options were unchecked. Raises InvalidSubmission for
+    anything else; whether the ids belong to the quiz is checked by
+    score_submission.
+    """
+    if not isinstance(data, dict):
+        raise InvalidSubmission("The submission must be an object of question ids to option id lists")
+    selections = {}
+    for question_id, option_ids in data.items():
+        if not str(question_id).isdigit():
+            raise InvalidSubmission(f"Invalid question id {question_id!r}")
+        if not isinstance(option_ids, list) or not all(
+                isinstance(option_id, int) and not isinstance(option_id, bool) for option_id in option_ids):
+            raise InvalidSubmission(f"Options of question {question_id} must be a list of option ids")
+        if option_ids or keep_empty:
+            selections[int(question_id)] = option_ids
+    return selections
+
+
+def validate_selections(answer_key, selections):
+    """Raise InvalidSubmission if selections reference questions or options outside the quiz."""
+    for question_id, option_ids in selections.items():
+        if question_id not in answer_key.options:
+            raise InvalidSubmission(f"Question {question_id} is not part of quiz {answer_key.quiz_id}")
+        for option_id in option_ids:
+            if option_id not in answer_key.options[question_id]:
+                raise InvalidSubmission(f"Option {option_id} does not belong to question {question_id}")
+
+
+def score_submission(answer_key, selections):
+    """Score a whole submission in memory against an answer key.
+
+    Pure function: no database or request access, so it can be used for
+    live submissions, batch re-scoring and benchmarks alike.
+
+    Per question: +4 when exactly the correct options are chosen, +1 per
+    correct option when only some of them are chosen, and one point off
+    per incorrect option otherwise. Only answered questions count toward
+    max_score: one with no option selected is skipped, like the form does.
+    """
+    final_score = 0
+    question_scores = {}
+    answers = []
+
+    for question_id, option_ids in selections.items():
+        if question_id not in answer_key.options:
+            raise InvalidSubmission(f"Question {question_id} is not part of quiz {answer_key.quiz_id}")
+        if not option_ids:
+            continue
+
+        question_options = answer_key.options[question_id]
+        correct_options = answer_key.correct[question_id]
+        correct_count = 0
+        incorrect_count = 0
+
+        for option_id in dict.fromkeys(option_ids):  # Ignore duplicates, keep order
+            if option_id not in question_options:
+                raise InvalidSubmission(f"Option {option_id} does not belong to question {question_id}")
+            is_correct = option_id in correct_options
+            if is_correct:
+                correct_count += 1
+            else:
+                incorrect_count += 1
+            answers.append((question_id, option_id, is_correct))
+
+        question_scores[question_id] = {'correct': correct_count, 'incorrect': incorrect_count}
+
+        if incorrect_count == 0:
+            if correct_count == len(correct_options):
+                final_score += 4
+            else:
+                final_score += correct_count
+        else:
+            if correct_count == 0:
+                final_score -= incorrect_count
+            else:
+                final_score += correct_count - incorrect_count
+
+    max_score = len(question_scores) * 4
+    percentage_score = (final_score / max_score) * 100 if max_score > 0 else 0
+    status = 'Passed' if percentage_score >= PASSING_SCORE_PERCENTAGE else 'Failed'
+
+    return ScoreResult(
+        score=final_score,
+        max_score=max_score,
+        percentage=percentage_score,
+        status=status,
+        question_scores=question_scores,
+        answers=answers
+    )
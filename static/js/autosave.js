@@ -0,0 +1,80 @@
+// Autosave of the quiz answers: every change is sent as a delta
+// {question_id: [checked option ids]}, debounced so a burst of clicks is one
+// request, and the saved draft is restored when the page is reloaded (e.g.
+// after the tablet lost the Wi-Fi).
+(function () {
+  var form = document.getElementById("quiz-form");
+  if (!form || !form.dataset.autosaveUrl || !window.fetch) return;
+
+  var url = form.dataset.autosaveUrl;
+  var DEBOUNCE = 1500; // ms after the last click
+  var RETRY = 5000; // ms, when the server could not be reached
+  var pending = {};
+  var timer = null;
+
+  function checked(name) {
+    return Array.prototype.map.call(
+      form.querySelectorAll('input[name="' + name + '"]:checked'),
+      function (input) {
+        return parseInt(input.value, 10);
+      }
+    );
+  }
+
+  function schedule(delay) {
+    clearTimeout(timer);
+    timer = setTimeout(flush, delay);
+  }
+
+  function flush() {
+    timer = null;
+    var delta = pending;
+    pending = {};
+    if (Object.keys(delta).length === 0) return;
+
+    fetch(url, {
+      method: "POST",
+      credentials: "same-origin",
+      keepalive: true,
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(delta),
+    })
+      .then(function (response) {
+        if (!response.ok) throw new Error("HTTP " + response.status);
+      })
+      .catch(function () {
+        // Keep newer changes, put the unsent ones back and try again later
+        Object.keys(delta).forEach(function (questionId) {
+          if (!(questionId in pending)) pending[questionId] = delta[questionId];
+        });
+        if (timer === null) schedule(RETRY);
+      });
+  }
+
+  form.addEventListener("change", function (event) {
+    var name = event.target.name;
+    if (!name || name.indexOf("question_") !== 0) return;
+    pending[name.slice("question_".length)] = checked(name);
+    schedule(DEBOUNCE);
+  });
+
+  window.addEventListener("pagehide", flush);
+
+  // Restore the saved answers; questions changed meanwhile are kept as is
+  fetch(url, { credentials: "same-origin" })
+    .then(function (response) {
+      return response.ok ? response.json() : {};
+    })
+    .then(function (draft) {
+      Object.keys(draft).forEach(function (questionId) {
+        if (questionId in pending) return;
+        var optionIds = draft[questionId].map(String);
+        form
+          .querySelectorAll('input[name="question_' + questionId + '"]')
+          .forEach(function (input) {
+            input.checked = optionIds.indexOf(input.value) !== -1;
+          });
+      });
+    })
+    .catch(function () {});
+})();
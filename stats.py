@@ -0,0 +1,201 @@
+import click
+from sqlalchemy import func, select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, User, Quiz, Attempt, AttemptStats, UserStats
+
+attempt_stats = AttemptStats.__table__
+user_stats = UserStats.__table__
+
+
+def record_attempts(connection, entries):
+    """Add attempts to the rollups; entries are (user_id, quiz_id, score, status).
+
+    Must run in the transaction that inserts the attempts. connection can be
+    db.session or a Core connection.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+
+    user_ids = {user_id for user_id, _, _, _ in entries}
+    sites = dict(
+        (user_id, (site, service))
+        for user_id, site, service in connection.execute(
+            select(User.id, User.site, User.service).where(User.id.in_(user_ids))
+        )
+    )
+
+    # Aggregate the batch first so each rollup row is written once
+    totals = {}
+    for user_id, quiz_id, score, status in entries:
+        site, service = sites[user_id]
+        row = totals.setdefault((quiz_id, site, service), {
+            'quiz_id': quiz_id, 'site': site, 'service': service, 'attempts': 0,
+            'passed': 0, 'score_sum': 0, 'min_score': score, 'max_score': score,
+        })
+        row['attempts'] += 1
+        row['passed'] += 1 if status == 'Passed' else 0
+        row['score_sum'] += score
+        row['min_score'] = min(row['min_score'], score)
+        row['max_score'] = max(row['max_score'], score)
+
+    statement = sqlite_insert(attempt_stats)
+    statement = statement.on_conflict_do_update(
+        index_elements=['quiz_id', 'site', 'service'],
+        set_={
+            'attempts': attempt_stats.c.attempts + statement.excluded.attempts,
+            'passed': attempt_stats.c.passed + statement.excluded.passed,
+            'score_sum': attempt_stats.c.score_sum + statement.excluded.score_sum,
+            # Two-argument min/max are SQLite's scalar functions
+            'min_score': func.min(attempt_stats.c.min_score, statement.excluded.min_score),
+            'max_score': func.max(attempt_stats.c.max_score, statement.excluded.max_score),
+        }
+    )
+    connection.execute(statement, list(totals.values()))
+
+
+def record_users(connection, users):
+    """Add registered users to the rollups; users are (site, service) pairs."""
+    totals = {}
+    for site, service in users:
+        totals[(site, service)] = totals.get((site, service), 0) + 1
+    if not totals:
+        return
+
+    statement = sqlite_insert(user_stats)
+    statement = statement.on_conflict_do_update(
+        index_elements=['site', 'service'],
+        set_={'users': user_stats.c.users + statement.excluded.users}
+    )
+    connection.execute(statement, [
+        {'site': site, 'service': service, 'users': count}
+        for (site, service), count in totals.items()
+    ])
+
+
+def _computed_attempt_stats():
+    return (
+        select(
+            Attempt.quiz_id, User.site, User.service,
+            func.count(Attempt.id).label('attempts'),
+            func.sum(db.case((Attempt.status == 'Passed', 1), else_=0)).label('passed'),
+            func.sum(Attempt.score).label('score_sum'),
+            func.min(Attempt.score).label('min_score'),
+            func.max(Attempt.score).label('max_score'),
+        )
+        .join(User, User.id == Attempt.user_id)
+        .group_by(Attempt.quiz_id, User.site, User.service)
+    )
+
+
+def _computed_user_stats():
+    return select(User.site, User.service, func.count(User.id).label('users')).group_by(User.site, User.service)
+
+
+def rebuild(connection):
+    """Recompute both rollups from the Attempts and Users tables."""
+    connection.execute(delete(attempt_stats))
+    connection.execute(attempt_stats.insert().from_select(
+        ['quiz_id', 'site', 'service', 'attempts', 'passed', 'score_sum', 'min_score', 'max_score'],
+        _computed_attempt_stats()
+    ))
+    connection.execute(delete(user_stats))
+    connection.execute(user_stats.insert().from_select(['site', 'service', 'users'], _computed_user_stats()))
+
+
+def check(connection):
+    """Compare the rollups with a full recomputation; returns a list of differences."""
+    differences = []
+    comparisons = (
+        ('AttemptStats', 3, _computed_attempt_stats(), select(
+            attempt_stats.c.quiz_id, attempt_stats.c.site, attempt_stats.c.service, attempt_stats.c.attempts,
+            attempt_stats.c.passed, attempt_stats.c.score_sum, attempt_stats.c.min_score, attempt_stats.c.max_score)),
+        ('UserStats', 2, _computed_user_stats(), select(user_stats.c.site, user_stats.c.service, user_stats.c.users)),
+    )
+    for name, key_length, computed_query, stored_query in comparisons:
+        computed = {tuple(row[:key_length]): tuple(row[key_length:]) for row in connection.execute(computed_query)}
+        stored = {tuple(row[:key_length]): tuple(row[key_length:]) for row in connection.execute(stored_query)}
+        for key in sorted(set(computed) | set(stored), key=repr):
+            if computed.get(key) != stored.get(key):
+                differences.append((name, key, stored.get(key), computed.get(key)))
+    return differences
+
+
+def _breakdown(attempt_column, user_column):
+    users = dict(
+        db.session.query(user_column, func.sum(UserStats.users)).group_by(user_column).all()
+    )
+    attempts = {
+        name: (attempt_count, passed, score_sum)
+        for name, attempt_count, passed, score_sum in db.session.query(
+            attempt_column,
+            func.sum(AttemptStats.attempts),
+            func.sum(AttemptStats.passed),
+            func.sum(AttemptStats.score_sum),
+        ).group_by(attempt_column).all()
+    }
+
+    breakdown = []
+    for name in sorted(set(users) | set(attempts)):
+        attempt_count, passed, score_sum = attempts.get(name, (0, 0, 0))
+        breakdown.append({
+            'name': name,
+            'user_count': users.get(name, 0),
+            'attempt_count': attempt_count,
+            'pass_rate': passed * 100.0 / attempt_count if attempt_count else 0,
+            'avg_score': score_sum / attempt_count if attempt_count else None,
+        })
+    return breakdown
+
+
+def dashboard_metrics():
+    """Everything admin.dashboard shows, read from the rollups only."""
+    total_users = db.session.query(func.coalesce(func.sum(UserStats.users), 0)).scalar()
+    total_quizzes = Quiz.query.count()
+
+    per_quiz = (
+        db.session.query(
+            Quiz.title,
+            func.coalesce(func.sum(AttemptStats.attempts), 0),
+            func.sum(AttemptStats.score_sum),
+            func.min(AttemptStats.min_score),
+            func.max(AttemptStats.max_score),
+        )
+        .outerjoin(AttemptStats, AttemptStats.quiz_id == Quiz.id)
+        .group_by(Quiz.id)
+        .all()
+    )
+
+    total_attempts = sum(attempts for _, attempts, _, _, _ in per_quiz)
+    score_sum = sum(total or 0 for _, _, total, _, _ in per_quiz)
+    min_scores = [low for _, _, _, low, _ in per_quiz if low is not None]
+    max_scores = [high for _, _, _, _, high in per_quiz if high is not None]
+
+    return {
+        "total_users": total_users,
+        "total_quizzes": total_quizzes,
+        "total_attempts": total_attempts,
+        "attempts_per_quiz": [{'title': title, 'attempt_count': attempts} for title, attempts, _, _, _ in per_quiz],
+        "score_distribution": {
+            "avg_score": score_sum / total_attempts if total_attempts else None,
+            "min_score": min(min_scores) if min_scores else None,
+            "max_score": max(max_scores) if max_scores else None,
+        },
+        "per_site": _breakdown(AttemptStats.site, UserStats.site),
+        "per_service": _breakdown(AttemptStats.service, UserStats.service),
+    }
+
+
+def init_app(app):
+    @app.cli.command('rebuild-stats')
+    @click.option('--check-only', is_flag=True, help='Only report differences, do not rebuild.')
+    def rebuild_stats_command(check_only):
+        """Recompute the dashboard rollups from Attempts and Users."""
+        with db.engine.begin() as connection:
+            differences = check(connection)
+            for name, key, stored, computed in differences:
+                click.echo(f'{name} {key}: stored {stored}, computed {computed}')
+            click.echo(f'{len(differences)} rollup rows out of date.')
+            if not check_only:
+                rebuild(connection)
+                click.echo('Rollups rebuilt.')
@@ -0,0 +1,199 @@
+from concurrent.futures import Future
+import atexit
+import queue
+import threading
+import time
+
+from flask import current_app
+from models import db, Attempt
+import answer_store
+import drafts
+import stats
+import monitoring
+
+
+def save_attempt(user_id, quiz_id, result, end_time):
+    """Write a scored attempt and all of its answers in a single transaction; returns the attempt id.
+
+    The attempt id comes from a flush rather than an intermediate commit,
+    and the answers go out as one executemany insert (or a single packed row,
+    see answer_store), so a submission costs one write-lock hold and one
+    fsync and can never be left without answers.
+    """
+    try:
+        attempt = Attempt(
+            user_id=user_id,
+            quiz_id=quiz_id,
+            score=result.score,
+            status=result.status,
+            time=end_time
+        )
+        db.session.add(attempt)
+        db.session.flush()  # Assigns attempt.id inside the open transaction
+        attempt_id = attempt.id
+
+        answer_store.write(db.session, [(attempt_id, quiz_id, result.answers)])
+        drafts.delete_drafts(db.session, [(user_id, quiz_id)])  # The autosaved answers are now the attempt
+
+        stats.record_attempts(db.session, [(user_id, quiz_id, result.score, result.status)])
+        db.session.commit()
+        return attempt_id
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+class WriterBusy(Exception):
+    """The group-commit queue is full; the submission was not accepted."""
+
+
+class _PendingAttempt:
+    __slots__ = ('user_id', 'quiz_id', 'result', 'end_time', 'done')
+
+    def __init__(self, user_id, quiz_id, result, end_time):
+        self.user_id = user_id
+        self.quiz_id = quiz_id
+        self.result = result
+        self.end_time = end_time
+        self.done = Future()
+
+
+class GroupCommitWriter:
+    """Background writer that coalesces many attempts into one transaction.
+
+    When the quiz timer runs out every participant submits within the same
+    second. Instead of each request thread taking the SQLite write lock and
+    paying an fsync, submissions are queued and a single thread commits
+    whatever arrived in the last few milliseconds together. Callers block
+    until the transaction holding their attempt has committed, so the
+    redirect to the result page is only sent for durable attempts.
+    """
+
+    def __init__(self, app, max_batch=200, max_delay=0.005, max_pending=2000, enqueue_timeout=2.0):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_pending)  # Backpressure limit
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, quiz_id, result, end_time, timeout=30):
+        if self._stopping.is_set():
+            raise WriterBusy('Submission writer is shutting down')
+
+        pending = _PendingAttempt(user_id, quiz_id, result, end_time)
+        try:
+            self._queue.put(pending, timeout=self.enqueue_timeout)
+        except queue.Full:
+            raise WriterBusy(f'{self._queue.maxsize} submissions already waiting to be written')
+
+        # Wait for the commit that contains this attempt; re-raises its error
+        return pending.done.result(timeout=timeout)
+
+    def shutdown(self, timeout=30):
+        """Stop accepting submissions and flush everything still queued."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return  # Queue drained, shutdown complete
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        with self.app.app_context():
+            try:
+                attempt_ids = self._write(batch)
+            except Exception as e:
+                print(f"Group commit of {len(batch)} attempts failed, retrying one by one: {e}")
+                monitoring.record_batch_retry()
+                # One bad attempt must not fail the whole group
+                for pending in batch:
+                    try:
+                        attempt_id = self._write([pending])[0]
+                    except Exception as single_error:
+                        pending.done.set_exception(single_error)
+                    else:
+                        pending.done.set_result(attempt_id)
+                return
+
+        for pending, attempt_id in zip(batch, attempt_ids):
+            pending.done.set_result(attempt_id)
+
+    def _write(self, batch):
+        attempt_ids = []
+        answers = []
+        with db.engine.begin() as connection:
+            for pending in batch:
+                inserted = connection.execute(
+                    Attempt.__table__.insert().values(
+                        user_id=pending.user_id,
+                        quiz_id=pending.quiz_id,
+                        score=pending.result.score,
+                        status=pending.result.status,
+                        time=pending.end_time
+                    )
+                )
+                attempt_id = inserted.inserted_primary_key[0]
+                attempt_ids.append(attempt_id)
+                answers.append((attempt_id, pending.quiz_id, pending.result.answers))
+            answer_store.write(connection, answers)
+            drafts.delete_drafts(connection, [(pending.user_id, pending.quiz_id) for pending in batch])
+            stats.record_attempts(connection, [
+                (pending.user_id, pending.quiz_id, pending.result.score, pending.result.status)
+                for pending in batch
+            ])
+        return attempt_ids
+
+
+def init_app(app):
+    """Start the group-commit writer when SUBMISSION_MODE is 'group_commit'."""
+    if app.config.get('SUBMISSION_MODE', 'sync') != 'group_commit':
+        return
+
+    writer = GroupCommitWriter(
+        app,
+        max_batch=app.config.get('GROUP_COMMIT_MAX_BATCH', 200),
+        max_delay=app.config.get('GROUP_COMMIT_MAX_DELAY', 0.005),
+        max_pending=app.config.get('GROUP_COMMIT_MAX_PENDING', 2000)
+    )
+    app.extensions['submission_writer'] = writer
+    atexit.register(writer.shutdown)  # Flush queued attempts on shutdown
+
+
+def persist(user_id, quiz_id, result, end_time):
+    """Store a scored attempt, through the group-commit writer if it is enabled."""
+    writer = current_app.extensions.get('submission_writer')
+    if writer is None:
+        attempt_id = save_attempt(user_id, quiz_id, result, end_time)
+    else:
+        # Give the request's connection back before waiting: the writer
+        # needs one from the same pool, and in a burst every waiting
+        # request would otherwise hold one and starve it
+        db.session.close()
+        attempt_id = writer.submit(user_id, quiz_id, result, end_time)
+    monitoring.record_submission(result.status)
+    return attempt_id
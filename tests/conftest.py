@@ -0,0 +1,75 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'test-password'
+HASH_METHOD = 'pbkdf2:sha256:1000'
+
+# The app reads its configuration from the environment when app.py is
+# imported, so everything is set up once for the whole session: the
+# production profile with a small pool and the group-commit writer, as
+# during an exam.
+_tmp = tempfile.mkdtemp(prefix='quiz-tests-')
+with open(os.path.join(_tmp, 'settings.py'), 'w') as f:
+    f.write("SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': 2, 'max_overflow': 2, 'pool_timeout': 5}\n")
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_tmp, 'test.db'),
+    'APP_SETTINGS': os.path.join(_tmp, 'settings.py'),
+    'DB_PROFILE': 'production',
+    'SUBMISSION_MODE': 'group_commit',
+    'PASSWORD_HASH_METHOD': HASH_METHOD,
+    'HASH_WORKERS': '0',
+    'LOGIN_MAX_FAILURES': '100000',
+    'JINJA_BYTECODE_CACHE_DIR': '',
+    'ASSETS_DIR': os.path.join(_tmp, 'assets'),
+    'METRICS_ENABLED': '1',
+})
+
+_emp_ids = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    from models import db
+    import quiz_io
+
+    with app.app_context():
+        db.create_all()
+        quiz = quiz_io.load_file(os.path.join(ROOT, 'initial', 'questions.txt'), 'Test quiz')
+        quiz_io.create_quiz(quiz, is_active=True)
+        db.session.remove()
+    return app
+
+
+@pytest.fixture
+def make_users(app):
+    """Create count fresh employees (one attempt per user and quiz, so tests never share them); returns their emp_ids."""
+    from werkzeug.security import generate_password_hash
+    from models import db, User
+
+    def make_users(count):
+        pwhash = generate_password_hash(PASSWORD, HASH_METHOD)
+        emp_ids = []
+        with app.app_context():
+            for _ in range(count):
+                number = next(_emp_ids)
+                emp_ids.append(f'T{number:06d}')
+                db.session.add(User(emp_id=emp_ids[-1], cin=f'TC{number:06d}', first_name='Test',
+                                    last_name=str(number), service='Tests', site='Lab', password=pwhash))
+            db.session.commit()
+            db.session.remove()
+        return emp_ids
+
+    return make_users
+
+
+def login(client, emp_id):
+    response = client.post('/login', data={'emp_id': emp_id, 'password': PASSWORD})
+    assert response.status_code == 302 and '/explanation' in response.headers['Location']
@@ -0,0 +1,59 @@
+import os
+import re
+
+import pytest
+
+import assets
+from conftest import ROOT
+
+PATH_DATA = re.compile(r'\sd="([^"]*)"')
+
+
+def path_values(text):
+    """Every path of an SVG as (commands and flags, numbers)."""
+    paths = []
+    for data in PATH_DATA.findall(text):
+        tokens = assets.path_tokens(data)
+        paths.append(([token for kind, token in tokens if kind != 'number'],
+                      [float(token) for kind, token in tokens if kind == 'number']))
+    return paths
+
+
+def assert_within_precision(original, minified, precision):
+    before = path_values(original)
+    after = path_values(minified)
+    assert len(before) == len(after)
+    worst = 0
+    for (structure, numbers), (new_structure, new_numbers) in zip(before, after):
+        assert new_structure == structure
+        assert len(new_numbers) == len(numbers)
+        worst = max([worst] + [abs(a - b) for a, b in zip(numbers, new_numbers)])
+    assert worst <= 10 ** -precision
+
+
+def test_packed_numbers_are_split():
+    assert assets.path_tokens('M1-.06.63.05l1e-3-2') == [
+        ('command', 'M'), ('number', '1'), ('number', '-.06'), ('number', '.63'), ('number', '.05'),
+        ('command', 'l'), ('number', '1e-3'), ('number', '-2'),
+    ]
+    # Arc flags are single digits, even without separators
+    assert assets.path_tokens('a1 1 0 01.5 2') == [
+        ('command', 'a'), ('number', '1'), ('number', '1'), ('number', '0'),
+        ('flag', '0'), ('flag', '1'), ('number', '.5'), ('number', '2'),
+    ]
+
+
+def test_minified_path_keeps_its_geometry():
+    original = '<svg><path d="M188.6,113.38c-.06.63.05-.33-2.57-6.81a1.72,1.72,0,0,0-.24,0a1 1 0 01.55 2z"/></svg>'
+    minified = assets.minify_svg(original, precision=1)
+    assert_within_precision(original, minified, 1)
+    assert '-.6.6' not in minified
+
+
+@pytest.mark.parametrize('name', ['logo-azura.svg', 'T.svg'])
+def test_shipped_svgs_within_precision(name):
+    with open(os.path.join(ROOT, 'static', name), encoding='utf-8') as f:
+        original = f.read()
+    minified = assets.minify_svg(original)
+    assert_within_precision(original, minified, assets.SVG_PRECISION)
+    assert len(minified) < len(original)
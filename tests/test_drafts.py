@@ -0,0 +1,72 @@
+import json
+
+import drafts
+from conftest import login
+from test_scoring import active_answer_key, stored_attempt
+
+
+def draft_rows(app, user_id, quiz_id):
+    from models import db, AnswerDraft
+
+    with app.app_context():
+        return db.session.query(AnswerDraft).filter_by(user_id=user_id, quiz_id=quiz_id).count()
+
+
+def user_id_of(app, emp_id):
+    from models import User
+
+    with app.app_context():
+        return User.query.filter_by(emp_id=emp_id).one().id
+
+
+def test_draft_saved_by_one_worker_is_read_by_another(app, make_users):
+    key = active_answer_key(app)
+    question_id = sorted(key.options)[0]
+    user_id = user_id_of(app, make_users(1)[0])
+
+    # Two buffers stand for two worker processes sharing the database
+    first, second = drafts.DraftBuffer(app), drafts.DraftBuffer(app)
+    try:
+        first.save(user_id, key.quiz_id, {question_id: sorted(key.correct[question_id])})
+        with app.app_context():
+            assert second.load(user_id, key.quiz_id) == {question_id: sorted(key.correct[question_id])}
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+
+def test_submission_promotes_and_deletes_the_draft(app, make_users):
+    key = active_answer_key(app)
+    emp_id = make_users(1)[0]
+    user_id = user_id_of(app, emp_id)
+    client = app.test_client()
+    login(client, emp_id)
+    quiz = client.get('/api/quiz').get_json()
+
+    # Every answer is autosaved, then one is unchecked again
+    delta = {str(question_id): sorted(key.correct[question_id]) for question_id in key.options}
+    autosave_url = f'/api/autosave/{key.quiz_id}'
+    assert client.post(autosave_url, data=json.dumps(delta), content_type='application/json').status_code == 204
+    unchecked = str(sorted(key.options)[0])
+    assert client.post(autosave_url, data=json.dumps({unchecked: []}),
+                       content_type='application/json').status_code == 204
+    assert int(unchecked) not in client.get(autosave_url).get_json()
+
+    response = client.post(f'/api/submit_quiz/{key.quiz_id}', data='{}', content_type='application/json',
+                           headers={'X-CSRF-Token': quiz['csrf_token']})
+    assert response.status_code == 200
+    score, status = stored_attempt(app, emp_id)
+    assert score == 4 * (len(key.options) - 1)
+    assert draft_rows(app, user_id, key.quiz_id) == 0
+
+    # A late autosave is refused, and one already in flight is not written
+    assert client.post(autosave_url, data=json.dumps(delta), content_type='application/json').status_code == 409
+    with app.app_context():
+        app.extensions['draft_buffer'].save(user_id, key.quiz_id, {int(unchecked): [1]})
+    assert draft_rows(app, user_id, key.quiz_id) == 0
+
+
+def test_writer_thread_starts_with_the_first_save(app):
+    buffer = drafts.DraftBuffer(app)
+    assert buffer._thread is None  # CLI commands never save, so never start it
+    buffer.shutdown()
@@ -0,0 +1,18 @@
+from werkzeug.security import generate_password_hash
+
+import hashing
+
+
+def test_default_method_keeps_existing_hashes():
+    service = hashing.HashingService(method=None, workers=0)
+    existing = generate_password_hash('secret')  # How the users were hashed before the pool
+    assert not service.needs_rehash(existing)
+    assert not service.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:1000'))
+    assert service.generate('secret').split('$', 1)[0] == existing.split('$', 1)[0]
+    assert service.check(existing, 'secret')
+
+
+def test_configured_method_upgrades_other_hashes():
+    service = hashing.HashingService(method='pbkdf2:sha256:1000', workers=0)
+    assert service.needs_rehash(generate_password_hash('secret'))
+    assert not service.needs_rehash(service.generate('secret'))
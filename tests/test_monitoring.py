@@ -0,0 +1,11 @@
+import pytest
+
+prometheus_client = pytest.importorskip('prometheus_client')
+
+
+def test_metrics_content_type(app):
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == prometheus_client.CONTENT_TYPE_LATEST
+    assert response.headers['Content-Type'].count('charset') == 1
+    assert b'quiz_http_requests_total' in response.get_data()
@@ -0,0 +1,33 @@
+import time
+
+import pytest
+from flask import g
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+import profiler
+
+
+@pytest.fixture
+def engine():
+    # A private engine, so the listeners are not installed for the whole app
+    engine = create_engine('sqlite://')
+    event.listen(engine, 'before_cursor_execute', profiler._before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', profiler._after_cursor_execute)
+    event.listen(engine, 'handle_error', profiler._statement_failed)
+    yield engine
+    engine.dispose()
+
+
+def test_failed_statement_is_not_charged_to_the_next_one(app, engine):
+    with app.test_request_context(), engine.connect() as connection:
+        g._profile = profile = profiler._RequestProfile()
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM missing_table'))
+        assert 'profile_started' not in connection.info
+
+        time.sleep(0.3)  # Would be counted as SQL time with a stale start time
+        connection.execute(text('SELECT 1'))
+
+    assert profile.sql_count == 2
+    assert profile.sql_ms < 300
@@ -0,0 +1,62 @@
+import json
+
+from werkzeug.datastructures import MultiDict
+
+import scoring
+from quiz_cache import AnswerKey
+from conftest import login
+from test_submissions import open_quiz
+
+
+def active_answer_key(app):
+    import quiz_cache
+
+    with app.app_context():
+        quiz = quiz_cache.get_active_quiz('fr')
+        return quiz_cache.get_answer_key(quiz.id)
+
+
+def stored_attempt(app, emp_id):
+    from models import db, Attempt, User
+
+    with app.app_context():
+        return (db.session.query(Attempt.score, Attempt.status).join(User, User.id == Attempt.user_id)
+                .filter(User.emp_id == emp_id).one())
+
+
+def test_empty_selections_do_not_count():
+    key = AnswerKey(1, {1: frozenset({10, 11}), 2: frozenset({20, 21})}, {1: frozenset({10}), 2: frozenset({20})})
+    answered = scoring.score_submission(key, {1: [10]})
+    with_empty = scoring.score_submission(key, scoring.selections_from_json({'1': [10], '2': []}))
+    assert (with_empty.score, with_empty.max_score, with_empty.status) == (4, 4, 'Passed')
+    assert with_empty == answered
+    # Deltas keep [] so an unchecked question replaces the saved one, and it still does not count
+    assert scoring.selections_from_json({'2': []}, keep_empty=True) == {2: []}
+    assert scoring.score_submission(key, {1: [10], 2: []}) == answered
+
+
+def test_form_and_api_score_the_same(app, make_users):
+    key = active_answer_key(app)
+    # Half the questions are left unanswered: counted toward max_score they would fail the attempt
+    answered = sorted(key.options)[:len(key.options) // 2]
+    selections = {question_id: sorted(key.correct[question_id]) for question_id in answered}
+    form_user, api_user = make_users(2)
+
+    client = app.test_client()
+    login(client, form_user)
+    url, csrf_token, _ = open_quiz(client)
+    form = MultiDict([('csrf_token', csrf_token)] + [(f'question_{question_id}', option_id)
+                                                     for question_id, option_ids in selections.items()
+                                                     for option_id in option_ids])
+    assert client.post(url, data=form).status_code == 302
+
+    client = app.test_client()
+    login(client, api_user)
+    quiz = client.get('/api/quiz').get_json()
+    body = {str(question_id): selections.get(question_id, []) for question_id in key.options}
+    response = client.post(f"/api/submit_quiz/{quiz['quiz']['id']}", data=json.dumps(body),
+                           content_type='application/json', headers={'X-CSRF-Token': quiz['csrf_token']})
+    assert response.status_code == 200
+
+    assert stored_attempt(app, api_user) == stored_attempt(app, form_user)
+    assert stored_attempt(app, form_user).status == 'Passed'
@@ -0,0 +1,56 @@
+import re
+import threading
+
+from werkzeug.datastructures import MultiDict
+
+from conftest import login
+
+CSRF_TOKEN = re.compile(r'name="csrf_token" value="([^"]+)"')
+SUBMIT_URL = re.compile(r'action="(/submit_quiz/\d+)"')
+OPTION = re.compile(r'name="question_(\d+)"\s+value="(\d+)"')
+
+
+def open_quiz(client):
+    """Load the quiz page; returns (submit url, csrf token, {question_id: [option_ids]})."""
+    page = client.get('/quiz').get_data(as_text=True)
+    options = {}
+    for question_id, option_id in OPTION.findall(page):
+        options.setdefault(question_id, []).append(option_id)
+    return SUBMIT_URL.search(page).group(1), CSRF_TOKEN.search(page).group(1), options
+
+
+def test_group_commit_burst_larger_than_pool(app, make_users):
+    from models import db, Attempt, User
+
+    engine_options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    submitters = (engine_options['pool_size'] + engine_options['max_overflow']) * 3
+
+    emp_ids = make_users(submitters)
+    clients = []
+    for emp_id in emp_ids:
+        client = app.test_client()
+        login(client, emp_id)
+        clients.append((client, open_quiz(client)))
+
+    # Everyone submits at once, like the timer running out for a whole room
+    barrier = threading.Barrier(submitters)
+    statuses = [None] * submitters
+
+    def submit(number):
+        client, (url, csrf_token, options) = clients[number]
+        form = MultiDict([('csrf_token', csrf_token)] + [(f'question_{question_id}', option_ids[0])
+                                                         for question_id, option_ids in options.items()])
+        barrier.wait()
+        statuses[number] = client.post(url, data=form).status_code
+
+    threads = [threading.Thread(target=submit, args=(number,)) for number in range(submitters)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [302] * submitters
+    with app.app_context():
+        stored = (db.session.query(Attempt).join(User, User.id == Attempt.user_id)
+                  .filter(User.emp_id.in_(emp_ids)).count())
+    assert stored == submitters
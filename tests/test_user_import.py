@@ -0,0 +1,30 @@
+import io
+
+import hashing
+import user_import
+
+HEADER = 'emp_id,cin,first_name,last_name,service,site,password\n'
+
+
+def import_csv(app, rows, hash_method=None):
+    from models import User
+
+    data = HEADER + ''.join(f'{emp_id},C{emp_id},Imported,User,Tests,Lab,secret\n' for emp_id in rows)
+    with app.app_context():
+        report = user_import.import_users(io.BytesIO(data.encode()), 'users.csv', hash_method, workers=0)
+        methods = {User.query.filter_by(emp_id=emp_id).one().password.split('$', 1)[0] for emp_id in rows}
+    return report, methods
+
+
+def test_import_hashes_with_the_normal_method_by_default(app):
+    assert app.config['BULK_IMPORT_HASH_METHOD'] is None
+    report, methods = import_csv(app, ['IMP001', 'IMP002'], app.config['BULK_IMPORT_HASH_METHOD'])
+    assert report.created == 2 and not report.errors
+    assert methods == {hashing.service.method}
+    assert report.warnings == []
+
+
+def test_cheaper_import_method_is_reported(app):
+    report, methods = import_csv(app, ['IMP003'], 'pbkdf2:sha256:1')
+    assert methods == {'pbkdf2:sha256:1'}
+    assert len(report.warnings) == 1 and 'pbkdf2:sha256:1 ' in report.warnings[0]
@@ -0,0 +1,171 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import csv
+import io
+
+import click
+from sqlalchemy.exc import IntegrityError
+from models import db, User
+import hashing
+import stats
+
+COLUMNS = ('emp_id', 'cin', 'first_name', 'last_name', 'service', 'site', 'password')
+
+# Rows inserted per transaction
+BATCH_SIZE = 5000
+
+# errors is a list of (row number, message); row 1 is the header.
+# warnings are messages about the import as a whole.
+ImportReport = namedtuple('ImportReport', ['created', 'errors', 'warnings'])
+
+
+def read_rows(stream, filename):
+    """Yield (row number, {column: value}) from a CSV or XLSX upload."""
+    data = stream.read()
+    if filename.lower().endswith('.xlsx'):
+        try:
+            import openpyxl  # Deferred: only imports need it
+        except ImportError:
+            raise ValueError('Reading XLSX files requires openpyxl; upload a CSV file instead')
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value or '').strip().lower() for value in next(rows, ())]
+        records = ([('' if value is None else str(value).strip()) for value in row] for row in rows)
+    else:
+        try:
+            reader = csv.reader(io.StringIO(data.decode('utf-8-sig'), newline=''))
+        except UnicodeDecodeError:
+            raise ValueError('CSV files must be encoded in UTF-8')
+        header = [value.strip().lower() for value in next(reader, [])]
+        records = ([value.strip() for value in row] for row in reader)
+
+    missing = [column for column in COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    positions = {column: header.index(column) for column in COLUMNS}
+
+    for row_number, values in enumerate(records, start=2):
+        if not any(values):
+            continue  # Blank line
+        yield row_number, {column: values[position] if position < len(values) else ''
+                           for column, position in positions.items()}
+
+
+def validate(rows):
+    """Split rows into valid ones and (row number, message) errors.
+
+    Duplicates against existing users are found with a single query over
+    Users instead of one lookup per row.
+    """
+    existing_emp_ids = set()
+    existing_cins = set()
+    for emp_id, cin in db.session.query(User.emp_id, User.cin):
+        existing_emp_ids.add(emp_id)
+        existing_cins.add(cin)
+
+    valid = []
+    errors = []
+    seen_emp_ids = {}
+    seen_cins = {}
+    for row_number, row in rows:
+        empty = [column for column in COLUMNS if not row[column]]
+        if empty:
+            errors.append((row_number, f"Missing {', '.join(empty)}"))
+            continue
+        if row['emp_id'] in existing_emp_ids:
+            errors.append((row_number, f"A user with employee ID {row['emp_id']} already exists"))
+            continue
+        if row['cin'] in existing_cins:
+            errors.append((row_number, f"A user with CIN {row['cin']} already exists"))
+            continue
+        if row['emp_id'] in seen_emp_ids:
+            errors.append((row_number, f"Employee ID {row['emp_id']} already used on row {seen_emp_ids[row['emp_id']]}"))
+            continue
+        if row['cin'] in seen_cins:
+            errors.append((row_number, f"CIN {row['cin']} already used on row {seen_cins[row['cin']]}"))
+            continue
+        seen_emp_ids[row['emp_id']] = row_number
+        seen_cins[row['cin']] = row_number
+        valid.append((row_number, row))
+    return valid, errors
+
+
+def hash_passwords(passwords, method, workers):
+    """Hash all initial passwords, spread over a process pool."""
+    if workers <= 0:
+        return [hashing.hash_password(password, method) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hashing.hash_password, passwords, repeat(method), chunksize=256))
+
+
+def _insert(rows):
+    db.session.execute(User.__table__.insert(), [row for _, row in rows])
+    stats.record_users(db.session, [(row['site'], row['service']) for _, row in rows])
+    db.session.commit()
+
+
+def insert_users(rows):
+    """Insert validated rows in batched transactions; returns (created, errors)."""
+    created = 0
+    errors = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        try:
+            _insert(batch)
+            created += len(batch)
+        except IntegrityError:
+            # Someone registered meanwhile: retry row by row to find out who
+            db.session.rollback()
+            for row_number, row in batch:
+                try:
+                    _insert([(row_number, row)])
+                    created += 1
+                except IntegrityError:
+                    db.session.rollback()
+                    errors.append((row_number, f"Employee ID {row['emp_id']} or CIN {row['cin']} already exists"))
+    return created, errors
+
+
+def import_users(stream, filename, hash_method=None, workers=None):
+    """Validate, hash and insert the users of a CSV/XLSX file.
+
+    Initial passwords are hashed with hash_method (BULK_IMPORT_HASH_METHOD),
+    PASSWORD_HASH_METHOD by default. A different method is reported as a
+    warning: hashing.rehash_if_needed only upgrades each hash at the user's
+    first login.
+    """
+    valid, errors = validate(read_rows(stream, filename))
+
+    hash_method = hash_method or hashing.service.method
+    workers = hashing.service.workers if workers is None else workers
+    hashes = hash_passwords([row['password'] for _, row in valid], hash_method, workers)
+    for (_, row), pwhash in zip(valid, hashes):
+        row['password'] = pwhash
+
+    created, insert_errors = insert_users(valid)
+    warnings = []
+    if created and hash_method != hashing.service.method:
+        warnings.append(f'Initial passwords were hashed with {hash_method} instead of '
+                        f'{hashing.service.method or "the default method"}. '
+                        f'Each hash is upgraded at the user\'s first login; accounts that never log in keep it.')
+    return ImportReport(created=created, errors=sorted(errors + insert_errors), warnings=warnings)
+
+
+def init_app(app):
+    @app.cli.command('import-users')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--hash-method', default=None, help='Hash method for the initial passwords (default: BULK_IMPORT_HASH_METHOD).')
+    @click.option('--workers', type=int, default=None, help='Hashing processes (default: HASH_WORKERS).')
+    def import_users_command(path, hash_method, workers):
+        """Create users from a CSV or XLSX file with columns emp_id, cin, first_name, last_name, service, site, password."""
+        with open(path, 'rb') as stream:
+            try:
+                report = import_users(stream, path, hash_method or app.config.get('BULK_IMPORT_HASH_METHOD'), workers)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+        for row_number, message in report.errors:
+            click.echo(f'row {row_number}: {message}')
+        for message in report.warnings:
+            click.echo(f'Warning: {message}', err=True)
+        click.echo(f'{report.created} users created, {len(report.errors)} rows rejected.')